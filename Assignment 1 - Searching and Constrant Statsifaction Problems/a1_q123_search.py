@@ -5,9 +5,21 @@ import matplotlib.pyplot as plt
 import random
 import heapq
 import math
+import copy
+import time
+import queue
+import multiprocessing
 import sys
+import asyncio
+import concurrent.futures
+import threading
+import os
+import pickle
+import hashlib
+import weakref
 from collections import defaultdict, deque, Counter
 from itertools import combinations
+from array import array
 import numpy as np
 
 # initialize random number generator for consistency 
@@ -36,10 +48,11 @@ class Problem(object):
 class Node:
     "A Node in a search tree."
     def __init__(self, state, parent=None, action=None, path_cost=0):
-        self.__dict__.update(state=state, parent=parent, action=action, path_cost=path_cost)
+        depth = 0 if parent is None else parent.depth + 1
+        self.__dict__.update(state=state, parent=parent, action=action, path_cost=path_cost, depth=depth)
 
     def __repr__(self): return '<{}>'.format(self.state)
-    def __len__(self): return 0 if self.parent is None else (1 + len(self.parent))
+    def __len__(self): return self.depth
     def __lt__(self, other): return self.path_cost < other.path_cost
     
 failure = Node('failure', path_cost=math.inf) # Indicates an algorithm couldn't find a solution.
@@ -55,15 +68,28 @@ def expand(problem, node):
         
 def path_actions(node):
     "The sequence of actions to get to this node."
-    if node.parent is None:
-        return []  
-    return path_actions(node.parent) + [node.action]
+    actions = [n.action for n in path_nodes_reversed(node) if n.parent is not None]
+    actions.reverse()
+    return actions
 
 def path_states(node):
     "The sequence of states to get to this node."
-    if node in (cutoff, failure, None): 
-        return []
-    return path_states(node.parent) + [node.state]
+    states = list(path_states_reversed(node))
+    states.reverse()
+    return states
+
+def path_nodes_reversed(node):
+    "Yield the nodes on the path to this node, from `node` back to the root."
+    if node in (cutoff, failure): 
+        return
+    while node is not None:
+        yield node
+        node = node.parent
+
+def path_states_reversed(node):
+    "Yield the states on the path to this node, from its state back to the initial state."
+    for n in path_nodes_reversed(node):
+        yield n.state
 
 
 # PriorityQueue - note 
@@ -72,7 +98,10 @@ def path_states(node):
 # sorting stability 
 
 class PriorityQueue:
-    """A queue in which the item with minimum f(item) is always popped first."""
+    """A queue in which the item with minimum f(item) is always popped first.
+    If `log` is set to a FrontierLog, every push and pop is recorded in it."""
+
+    log = None
 
     def __init__(self, items=(), key=lambda x: x): 
         self.key = key
@@ -85,11 +114,16 @@ class PriorityQueue:
         """Add item to the queuez."""
         pair = ((self.key(item),self.item_count), item)
         heapq.heappush(self.items, pair)
+        if self.log is not None:
+            self.log.push(pair[0][0], self.item_count, item)
         self.item_count+=1  
 
     def pop(self):
         """Pop and return the item with min f(item) value."""
-        return heapq.heappop(self.items)[1]
+        pair = heapq.heappop(self.items)
+        if self.log is not None:
+            self.log.pop(pair[0][1])
+        return pair[1]
     
     def top(self): return self.items[0][1]
 
@@ -99,50 +133,790 @@ class PriorityQueue:
     def __len__(self): return len(self.items)
 
 
+class IndexedPriorityQueue(PriorityQueue):
+    """A PriorityQueue that holds at most one item per `index(item)` (by default the
+    node's state). Adding an item whose index is already queued replaces the old one:
+    the old heap pair is marked removed and skipped when popped (lazy deletion), and
+    the heap is rebuilt whenever removed pairs outnumber live ones.
+    Ties are still broken by insertion order via `item_count`."""
+
+    removed = object() # placeholder for the item of a replaced pair
+
+    def __init__(self, items=(), key=lambda x: x, index=lambda item: item.state):
+        self.index = index
+        self.entries = {} # index -> live [score, item] pair in the heap
+        self.stale = 0
+        PriorityQueue.__init__(self, items, key)
+
+    def add(self, item):
+        """Add item to the queue, replacing any queued item with the same index."""
+        i = self.index(item)
+        old = self.entries.pop(i, None)
+        if old is not None:
+            old[1] = self.removed
+            self.stale += 1
+            if self.log is not None:
+                self.log.remove(old[0][1])
+        pair = [(self.key(item), self.item_count), item]
+        self.entries[i] = pair
+        heapq.heappush(self.items, pair)
+        if self.log is not None:
+            self.log.push(pair[0][0], self.item_count, item)
+        self.item_count += 1
+        if self.stale > len(self.entries):
+            self.compact()
+
+    def pop(self):
+        """Pop and return the live item with min f(item) value."""
+        self.drop_removed()
+        (score, count), item = heapq.heappop(self.items)
+        del self.entries[self.index(item)]
+        if self.log is not None:
+            self.log.pop(count)
+        return item
+
+    def top(self):
+        self.drop_removed()
+        return self.items[0][1]
+
+    def drop_removed(self):
+        "Discard removed pairs from the top of the heap."
+        while self.items and self.items[0][1] is self.removed:
+            heapq.heappop(self.items)
+            self.stale -= 1
+
+    def compact(self):
+        "Rebuild the heap without removed pairs."
+        self.items = [pair for pair in self.items if pair[1] is not self.removed]
+        heapq.heapify(self.items)
+        self.stale = 0
+
+    def get_items(self):
+        return [tuple(pair) for pair in self.items if pair[1] is not self.removed]
+
+    def __len__(self): return len(self.entries)
+
+
+class BucketQueue(PriorityQueue):
+    """A PriorityQueue for searches with few distinct priorities at a time, such
+    as path costs built from small integer action costs, or depths. Items are kept
+    in first-in first-out buckets, one per priority, with a small heap of the
+    priorities in use (Dial's algorithm without a fixed bucket array), so adding
+    and popping cost O(1) plus O(log buckets). Items are popped in exactly the same
+    order as from a PriorityQueue. If more than `max_buckets` priorities are ever
+    in use at once, the queue turns itself into an ordinary PriorityQueue heap."""
+
+    def __init__(self, items=(), key=lambda x: x, max_buckets=64):
+        self.buckets = {} # priority -> deque of (count, item); None once a heap
+        self.priorities = [] # heap of the priorities with a non-empty bucket
+        self.max_buckets = max_buckets
+        self.size = 0
+        PriorityQueue.__init__(self, items, key)
+
+    def add(self, item):
+        """Add item to the queue."""
+        if self.buckets is None:
+            return PriorityQueue.add(self, item)
+        score = self.key(item)
+        bucket = self.buckets.get(score)
+        if bucket is None:
+            if len(self.priorities) >= self.max_buckets:
+                self.to_heap()
+                return PriorityQueue.add(self, item)
+            bucket = self.buckets[score] = deque()
+            heapq.heappush(self.priorities, score)
+        bucket.append((self.item_count, item))
+        if self.log is not None:
+            self.log.push(score, self.item_count, item)
+        self.item_count += 1
+        self.size += 1
+
+    def pop(self):
+        """Pop and return the item with min f(item) value."""
+        if self.buckets is None:
+            return PriorityQueue.pop(self)
+        score = self.priorities[0]
+        bucket = self.buckets[score]
+        count, item = bucket.popleft()
+        if not bucket:
+            heapq.heappop(self.priorities)
+            del self.buckets[score]
+        if self.log is not None:
+            self.log.pop(count)
+        self.size -= 1
+        return item
+
+    def top(self):
+        if self.buckets is None:
+            return PriorityQueue.top(self)
+        return self.buckets[self.priorities[0]][0][1]
+
+    def to_heap(self):
+        "Move every item into the PriorityQueue heap, keeping their counts."
+        self.items = [((score, count), item) for score, bucket in self.buckets.items() for count, item in bucket]
+        heapq.heapify(self.items)
+        self.buckets = None
+
+    def get_items(self):
+        if self.buckets is None:
+            return PriorityQueue.get_items(self)
+        return [((score, count), item) for score in sorted(self.buckets) for count, item in self.buckets[score]]
+
+    def __len__(self): return len(self.items) if self.buckets is None else self.size
+
+
+class FrontierLog:
+    """A compact record of how a frontier evolves: one event per push, pop or
+    removal of a queue pair, plus a mark at the start of every search iteration.
+    Recording is O(1) per queue operation; frontier sizes and full snapshots are
+    rebuilt from the events on demand. Iterating over the log yields the same
+    snapshots `best_first_search` would otherwise have copied, so it can be used
+    in place of the `frontiers` list."""
+
+    PUSH, POP, REMOVE = 0, 1, 2
+
+    def __init__(self):
+        self.kinds = array('b')  # event kinds
+        self.counts = array('q') # item_count of the pair each event refers to
+        self.scores = []         # item_count -> score of the pushed pair
+        self.items = []          # item_count -> pushed item
+        self.marks = array('q')  # number of events before each iteration
+
+    def push(self, score, count, item):
+        self.kinds.append(self.PUSH)
+        self.counts.append(count)
+        self.scores.append(score)
+        self.items.append(item)
+
+    def pop(self, count):
+        self.kinds.append(self.POP)
+        self.counts.append(count)
+
+    def remove(self, count):
+        self.kinds.append(self.REMOVE)
+        self.counts.append(count)
+
+    def mark(self): self.marks.append(len(self.kinds))
+
+    def lengths(self):
+        "The size of the frontier at the start of every iteration."
+        sizes, size, e = [], 0, 0
+        for m in self.marks:
+            for kind in self.kinds[e:m]:
+                size += 1 if kind == self.PUSH else -1
+            sizes.append(size)
+            e = m
+        return sizes
+
+    def snapshot(self, i):
+        "The frontier as a list of ((score, count), item) pairs at the start of iteration i."
+        if not -len(self) <= i < len(self):
+            raise IndexError('frontier snapshot index out of range')
+        for k, frontier in enumerate(self):
+            if k == i % len(self):
+                return frontier
+
+    def __iter__(self):
+        "Replay the events, yielding the frontier at the start of every iteration."
+        heap, removed, e = [], set(), 0
+        for m in self.marks:
+            for kind, count in zip(self.kinds[e:m], self.counts[e:m]):
+                if kind == self.PUSH:
+                    heapq.heappush(heap, (self.scores[count], count))
+                elif kind == self.REMOVE:
+                    removed.add(count)
+                else:
+                    while heapq.heappop(heap)[1] != count: pass
+            e = m
+            yield [(pair, self.items[pair[1]]) for pair in heap if pair[1] not in removed]
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return list(self)[i]
+        return self.snapshot(i)
+
+    def __len__(self): return len(self.marks)
+
+
+# Search statistics - counters that best_first_search fills in when it is
+# given a SearchStats; with stats=None nothing is counted or timed.
+
+class SearchStats:
+    """Counters for one best-first search:
+        expanded       - nodes taken off the frontier and expanded
+        pushed         - children added to the frontier
+        duplicates     - pushes for a state that was already reached (by a costlier path)
+        pruned         - children dropped because their state was reached as cheaply
+        peak_frontier  - the largest number of frontier entries
+        evaluations    - calls of the priority function f, and
+        evaluation_seconds - the time spent in them (which is mostly the heuristic)
+        seconds        - the wall-clock time of the whole search
+    The optional hooks on_expand(node) and on_push(node) are called as nodes are
+    expanded and pushed."""
+
+    def __init__(self, on_expand=None, on_push=None):
+        self.on_expand, self.on_push = on_expand, on_push
+        self.expanded = self.pushed = self.duplicates = self.pruned = 0
+        self.peak_frontier = self.evaluations = 0
+        self.seconds = self.evaluation_seconds = 0.0
+
+    def timed(self, f):
+        "Wrap the priority function f so its calls are counted and timed."
+        def timed_f(node):
+            t = time.perf_counter()
+            value = f(node)
+            self.evaluation_seconds += time.perf_counter() - t
+            self.evaluations += 1
+            return value
+        return timed_f
+
+    def start(self): self.started = time.perf_counter()
+    def stop(self):  self.seconds += time.perf_counter() - self.started
+
+    def expand(self, node):
+        self.expanded += 1
+        if self.on_expand: self.on_expand(node)
+
+    def push(self, node, duplicate):
+        self.pushed += 1
+        self.duplicates += duplicate
+        if self.on_push: self.on_push(node)
+
+    @property
+    def generated(self): return self.pushed + self.pruned
+
+    @property
+    def seconds_per_expansion(self): return self.seconds / max(self.expanded, 1)
+
+    def as_dict(self):
+        names = ('expanded', 'generated', 'pushed', 'duplicates', 'pruned', 'peak_frontier',
+                 'evaluations', 'evaluation_seconds', 'seconds', 'seconds_per_expansion')
+        return {name: getattr(self, name) for name in names}
+
+    def __repr__(self):
+        return 'SearchStats({})'.format(', '.join('{}={:.6g}'.format(*item) for item in self.as_dict().items()))
+
+
 # Different search algorithms 
 # defined by appropriate definition of priorities 
 
 
-def best_first_search(problem, f):
-    "Search nodes with minimum f(node) value first."
+def best_first_search(problem, f, frontier_type=None, trace='snapshots', stats=None, arena=False):
+    """Search nodes with minimum f(node) value first.
+    With arena=True the search tree is kept in a NodeArena instead of one Node per
+    child (see arena_best_first_search); `frontier_type` and `trace` are then
+    unused, no frontiers are recorded, and `reached` is the arena.
+    Pass frontier_type=IndexedPriorityQueue to replace, rather than duplicate,
+    frontier entries for states that are reached again by a cheaper path.
+    By default the frontier is a BucketQueue, which is faster when f takes few
+    distinct values (such as small integer path costs) and falls back to a heap
+    otherwise; with trace='snapshots' it is a PriorityQueue, whose heap layout
+    is what the snapshots record.
+    With trace='snapshots' the returned `frontiers` is a list of frontier copies,
+    one per iteration; trace='delta' returns a FrontierLog instead, and
+    trace=None records nothing.
+    Pass a SearchStats as `stats` to collect counters and timings."""
+    if arena:
+        return arena_best_first_search(problem, f, stats)
+    if stats is not None:
+        stats.start()
+        f = stats.timed(f)
+    if frontier_type is None:
+        frontier_type = PriorityQueue if trace == 'snapshots' else BucketQueue
     node = Node(problem.initial)
-    frontier = PriorityQueue([node], key=f)
-    reached = {problem.initial: node}
+    frontier = frontier_type(key=f)
     frontiers = [] 
+    if trace == 'delta':
+        frontier.log = frontiers = FrontierLog()
+    frontier.add(node)
+    reached = {problem.initial: node}
     while frontier:
-        frontier_items = frontier.get_items() # get frontiers from priority queue
-        frontiers.append(frontier_items)  # Append the current frontier to the list
+        if trace == 'delta':
+            frontiers.mark()
+        elif trace:
+            frontier_items = frontier.get_items() # get frontiers from priority queue
+            frontiers.append(frontier_items)  # Append the current frontier to the list
         node = frontier.pop()
         
         if problem.is_goal(node.state):
+            if stats is not None: stats.stop()
             return (node,reached,frontiers)
-        for child in expand(problem, node):
-            s = child.state
-            if s not in reached or child.path_cost < reached[s].path_cost:
-                reached[s] = child
-                frontier.add(child)
+        if stats is None:
+            for child in expand(problem, node):
+                s = child.state
+                if s not in reached or child.path_cost < reached[s].path_cost:
+                    reached[s] = child
+                    frontier.add(child)
+        else:
+            stats.expand(node)
+            for child in expand(problem, node):
+                s = child.state
+                if s not in reached or child.path_cost < reached[s].path_cost:
+                    stats.push(child, s in reached)
+                    reached[s] = child
+                    frontier.add(child)
+                else:
+                    stats.pruned += 1
+            stats.peak_frontier = max(stats.peak_frontier, len(frontier))
         
+    if stats is not None: stats.stop()
     return (failure, reached, frontiers)
 
 def g(n): return n.path_cost
 
-def astar_search(problem, h=None):
+def astar_search(problem, h=None, stats=None, trace='snapshots'):
     """Search nodes with minimum f(n) = g(n) + h(n)."""
     h = h or problem.h
-    return best_first_search(problem, f=lambda n: g(n) + h(n))
+    return best_first_search(problem, f=lambda n: g(n) + h(n), trace=trace, stats=stats)
         
-def greedy_bfs(problem, h=None):
+def greedy_bfs(problem, h=None, stats=None, trace='snapshots'):
     """Search nodes with minimum h(n)."""
     h = h or problem.h
-    return best_first_search(problem, f=h)
+    return best_first_search(problem, f=h, trace=trace, stats=stats)
 
-def uniform_cost_search(problem):
+def uniform_cost_search(problem, stats=None, trace='snapshots'):
     "Search nodes with minimum path cost first."
-    return best_first_search(problem, f=g)
+    return best_first_search(problem, f=g, trace=trace, stats=stats)
 
-def breadth_first_bfs(problem):
+def breadth_first_bfs(problem, stats=None, trace='snapshots'):
     "Search shallowest nodes in the search tree first; using best-first."
-    return best_first_search(problem, f=len)
+    return best_first_search(problem, f=len, trace=trace, stats=stats)
+
+
+# Node arena - a compact alternative to building one `Node` per child.
+# The search tree is kept in parallel arrays indexed by node number,
+# and `Node` objects are only built for the solution that is returned.
+
+class NodeArena:
+    """A search tree stored as parallel arrays of state id, parent index, action,
+    path cost and depth. States are interned to integer ids, so each state is
+    stored once, and `best[state id]` is the index of the cheapest node reaching it
+    (this plays the part of the `reached` dict)."""
+
+    def __init__(self):
+        self.ids = {}               # state -> state id
+        self.states = []            # state id -> state
+        self.best = array('q')      # state id -> index of best node, -1 if none
+        self.state = array('q')     # node index -> state id
+        self.parent = array('q')    # node index -> parent node index, -1 for the root
+        self.action = []            # node index -> action
+        self.path_cost = []         # node index -> path cost (a list, so integer costs stay integers)
+        self.depth = array('q')     # node index -> number of actions from the root
+
+    def intern(self, state):
+        """Return the integer id of `state`, adding it if it is new."""
+        sid = self.ids.get(state)
+        if sid is None:
+            sid = self.ids[state] = len(self.states)
+            self.states.append(state)
+            self.best.append(-1)
+        return sid
+
+    def add(self, sid, parent=-1, action=None, path_cost=0):
+        """Add a node for state id `sid` and return its index."""
+        i = len(self.state)
+        self.state.append(sid)
+        self.parent.append(parent)
+        self.action.append(action)
+        self.path_cost.append(path_cost)
+        self.depth.append(0 if parent < 0 else self.depth[parent] + 1)
+        return i
+
+    def node(self, i):
+        "Materialise the `Node` chain from the root to node `i`."
+        chain = []
+        while i >= 0:
+            chain.append(i)
+            i = self.parent[i]
+        node = None
+        for j in reversed(chain):
+            node = Node(self.states[self.state[j]], node, self.action[j], self.path_cost[j])
+        return node
+
+    def reached(self):
+        "A {state: Node} dict like the one built by `best_first_search` (costly on big trees)."
+        return {s: self.node(self.best[sid]) for sid, s in enumerate(self.states) if self.best[sid] >= 0}
+
+    def __len__(self): return len(self.state)
+
+
+class ArenaNode:
+    """A `Node`-like view of one entry in a `NodeArena`, so priority functions
+    such as `g`, `len` and `problem.h` work unchanged on arena nodes."""
+    __slots__ = ('arena', 'index')
+
+    def __init__(self, arena, index):
+        self.arena, self.index = arena, index
+
+    @property
+    def state(self): return self.arena.states[self.arena.state[self.index]]
+    @property
+    def action(self): return self.arena.action[self.index]
+    @property
+    def path_cost(self): return self.arena.path_cost[self.index]
+    @property
+    def parent(self):
+        p = self.arena.parent[self.index]
+        return None if p < 0 else ArenaNode(self.arena, p)
+
+    def __repr__(self): return '<{}>'.format(self.state)
+    def __len__(self): return self.arena.depth[self.index]
+    def __lt__(self, other): return self.path_cost < other.path_cost
+
+
+def arena_best_first_search(problem, f, stats=None):
+    """Search nodes with minimum f(node) value first, keeping the search tree in a
+    `NodeArena`. Returns (node, arena, frontiers) where only `node` and its
+    ancestors are real `Node` objects; `arena.reached()` rebuilds the reached dict.
+    This is what best_first_search(problem, f, arena=True) runs. The hooks of a
+    SearchStats passed as `stats` get ArenaNode views rather than Nodes."""
+    if stats is not None:
+        stats.start()
+        f = stats.timed(f)
+    arena = NodeArena()
+    view = ArenaNode(arena, arena.add(arena.intern(problem.initial)))
+    arena.best[0] = 0
+    frontier = [(f(view), 0, 0)] # a heap of (score, count, node index) triples
+    count = 1
+    while frontier:
+        i = heapq.heappop(frontier)[2]
+        s = arena.states[arena.state[i]]
+        if problem.is_goal(s):
+            if stats is not None: stats.stop()
+            return (arena.node(i), arena, [])
+        if stats is not None:
+            stats.expand(ArenaNode(arena, i))
+        cost = arena.path_cost[i]
+        for action in problem.actions(s):
+            s1 = problem.result(s, action)
+            cost1 = cost + problem.action_cost(s, action, s1)
+            sid = arena.intern(s1)
+            j = arena.best[sid]
+            if j < 0 or cost1 < arena.path_cost[j]:
+                view.index = arena.best[sid] = arena.add(sid, i, action, cost1)
+                heapq.heappush(frontier, (f(view), count, view.index))
+                count += 1
+                if stats is not None: stats.push(ArenaNode(arena, view.index), j >= 0)
+            elif stats is not None:
+                stats.pruned += 1
+        if stats is not None:
+            stats.peak_frontier = max(stats.peak_frontier, len(frontier))
+
+    if stats is not None: stats.stop()
+    return (failure, arena, [])
+
+
+# Bidirectional search - a forward search from the initial state and a backward
+# search from the goal, stopping when they provably cannot improve on the best
+# meeting point found so far.
+
+def bidirectional_best_first_search(problem, reverse=None, hf=None, hb=None):
+    """Bidirectional search for a problem whose actions can be undone at the same
+    cost, such as a RouteProblem on an undirected Map. `reverse` is the problem to
+    search backwards from the goal; by default it is `problem` with `initial` and
+    `goal` swapped (pass a RouteProblem on the reversed Map for directed graphs).
+    Each step expands the side whose top key is smaller, and the search stops once
+    the two top keys add up to the cost of the best meeting point, which is then
+    optimal. Keys are g(n) plus the average potential (hf(n) - hb(n)) / 2 for the
+    forward side and its negation for the backward side, where hf estimates the
+    distance to the goal and hb the distance to the initial state; with consistent
+    heuristics this keeps the search optimal, and with none it is bidirectional
+    uniform-cost search. Returns (node, (forward reached, backward reached), frontiers)."""
+    if reverse is None:
+        reverse = copy.copy(problem)
+        reverse.initial, reverse.goal = problem.goal, problem.initial
+    hf = hf or (lambda n: 0)
+    hb = hb or (lambda n: 0)
+    forward = (problem, IndexedPriorityQueue([Node(problem.initial)], key=lambda n: g(n) + (hf(n) - hb(n)) / 2))
+    backward = (reverse, IndexedPriorityQueue([Node(reverse.initial)], key=lambda n: g(n) + (hb(n) - hf(n)) / 2))
+    reached = ({problem.initial: forward[1].top()}, {reverse.initial: backward[1].top()})
+    best, meet = math.inf, None
+    if problem.initial in reached[1]:
+        best, meet = 0, problem.initial
+    while forward[1] and backward[1]:
+        top_f = forward[1].key(forward[1].top())
+        top_b = backward[1].key(backward[1].top())
+        if top_f + top_b >= best:
+            break
+        side = 0 if top_f <= top_b else 1
+        (p, frontier), here, there = (forward, backward)[side], reached[side], reached[1 - side]
+        for child in expand(p, frontier.pop()):
+            s = child.state
+            if s not in here or child.path_cost < here[s].path_cost:
+                here[s] = child
+                frontier.add(child)
+                if s in there and child.path_cost + there[s].path_cost < best:
+                    best, meet = child.path_cost + there[s].path_cost, s
+
+    if meet is None:
+        return (failure, reached, [])
+    return (join_paths(problem, reached[0][meet], reached[1][meet]), reached, [])
+
+def join_paths(problem, node, back):
+    """Extend the forward `node` along the backward search path `back`, which ends
+    in the same state, giving a single node chain from the initial state to the goal."""
+    while back.parent is not None:
+        s, s1 = node.state, back.parent.state
+        action = next(a for a in problem.actions(s) if problem.result(s, a) == s1)
+        node = Node(s1, node, action, node.path_cost + problem.action_cost(s, action, s1))
+        back = back.parent
+    return node
+
+def bidirectional_uniform_cost_search(problem, reverse=None):
+    "Search from both ends with minimum path cost first."
+    return bidirectional_best_first_search(problem, reverse)
+
+def bidirectional_astar_search(problem, reverse=None):
+    """Search from both ends using `problem.h` forwards and `reverse.h` backwards."""
+    if reverse is None:
+        reverse = copy.copy(problem)
+        reverse.initial, reverse.goal = problem.goal, problem.initial
+    return bidirectional_best_first_search(problem, reverse, hf=problem.h, hb=reverse.h)
+
+
+# Memory-bounded searches - these keep only the current path (IDA*) or a fixed
+# number of nodes (SMA*) instead of every reached node.
+
+def ida_star_search(problem, h=None, max_bound=math.inf, max_table=100000):
+    """Iterative deepening A*: repeated depth-first searches, each pruning nodes with
+    f(n) = g(n) + h(n) above a bound that grows to the smallest pruned f each round.
+    Besides the states on the current path, each round remembers the lowest g of up
+    to `max_table` states and prunes later nodes that reach them no more cheaply,
+    so memory is bounded by the path length plus `max_table`.
+    Returns (node, reached, frontiers) like best_first_search, with `cutoff` as the
+    node if the bound would pass `max_bound`."""
+    h = h or problem.h
+    root = Node(problem.initial)
+    if problem.is_goal(root.state):
+        return (root, {}, [])
+    bound = g(root) + h(root)
+    while bound <= max_bound:
+        next_bound = math.inf
+        on_path = {root.state}
+        table = {root.state: 0}
+        stack = [(root, expand(problem, root))]
+        while stack:
+            node, children = stack[-1]
+            child = next(children, None)
+            if child is None:
+                stack.pop()
+                on_path.discard(node.state)
+            elif child.state not in on_path and table.get(child.state, math.inf) > child.path_cost:
+                if len(table) < max_table or child.state in table:
+                    table[child.state] = child.path_cost
+                f = g(child) + h(child)
+                if f > bound:
+                    next_bound = min(next_bound, f)
+                elif problem.is_goal(child.state):
+                    return (child, {}, [])
+                else:
+                    on_path.add(child.state)
+                    stack.append((child, expand(problem, child)))
+        if next_bound == math.inf:
+            return (failure, {}, [])
+        bound = next_bound
+    return (cutoff, {}, [])
+
+
+class SMANode(Node):
+    """A Node in an SMA* search tree, which also keeps its f value (backed up from
+    its children), the children currently in memory, the f values of forgotten
+    children, and a version number used to invalidate old queue entries."""
+    def __init__(self, state, parent=None, action=None, path_cost=0, index=None):
+        Node.__init__(self, state, parent, action, path_cost)
+        self.__dict__.update(index=index, f=0, successors=None, next_index=0,
+                             children={}, forgotten={}, in_queue=False, version=0)
+
+    def leaf(self): return not self.children
+
+    def generated_all(self): return self.next_index >= len(self.successors)
+
+
+def sma_star_search(problem, max_nodes=100000, h=None):
+    """Simplified memory-bounded A*: A* that keeps at most `max_nodes` nodes in
+    memory. Successors are generated one at a time; when memory is full, the
+    shallowest leaf with the highest f is forgotten and its f is remembered by its
+    parent so the subtree can be regenerated if it becomes promising again.
+    A successor is pruned when another node in memory reaches its state at no
+    greater cost. Finds an optimal solution whenever one fits in memory (a path of at most
+    max_nodes states) and h is admissible. Returns (node, reached, frontiers) like
+    best_first_search; the node is `cutoff` if the memory cap ruled out every
+    remaining path, or `failure` if there is no solution at all."""
+    h = h or problem.h
+    count = 0
+    best, worst = [], [] # heaps of queue entries; stale entries are skipped
+
+    table = {} # state -> the in-memory node reaching it most cheaply
+
+    def touch(node):
+        "Record a change to `node`, queueing fresh entries for it if it is in the queue."
+        nonlocal count
+        node.version += 1
+        if node.in_queue:
+            heapq.heappush(best, (node.f, -node.depth, count, node.version, node))
+            if node.leaf():
+                heapq.heappush(worst, (-node.f, node.depth, count, node.version, node))
+            count += 1
+
+    def top(heap, exclude=None):
+        "The first valid entry of `heap` (for `worst`, a leaf other than `exclude` and the root)."
+        skipped = []
+        while heap:
+            entry = heap[0]
+            node = entry[-1]
+            if node.version != entry[-2] or not node.in_queue:
+                heapq.heappop(heap)
+            elif heap is worst and (node is exclude or node.parent is None or not node.leaf()):
+                skipped.append(heapq.heappop(heap))
+            else:
+                break
+        for entry in skipped:
+            if entry[-1] is exclude:
+                heapq.heappush(heap, entry)
+        return heap[0][-1] if heap else None
+
+    def backup(node):
+        "Once all of node's successors have been generated, raise its f to the best below it."
+        while node is not None and node.generated_all():
+            f = min([c.f for c in node.children.values()] + list(node.forgotten.values()),
+                    default=math.inf)
+            if f == node.f:
+                break
+            node.f = f
+            touch(node)
+            node = node.parent
+
+    def forget(node):
+        "Drop leaf `node` from memory, remembering its f in its parent."
+        nonlocal used
+        used -= 1
+        if table.get(node.state) is node:
+            del table[node.state]
+        parent = node.parent
+        del parent.children[node.index]
+        parent.forgotten[node.index] = node.f
+        node.in_queue = False
+        touch(node)
+        parent.in_queue = True
+        backup(parent)
+        touch(parent)
+
+    def next_successor(node):
+        "Generate the next successor of node in order, or regenerate its most promising forgotten one."
+        if node.successors is None:
+            ancestors = set(path_states_reversed(node))
+            node.successors = [(a, s1) for a in problem.actions(node.state)
+                               for s1 in [problem.result(node.state, a)] if s1 not in ancestors]
+        if not node.generated_all():
+            i = node.next_index
+            node.next_index += 1
+        else:
+            i = min(node.forgotten, key=node.forgotten.get, default=None)
+            if i is None or node.forgotten[i] == math.inf:
+                return None
+        action, s1 = node.successors[i]
+        cost = node.path_cost + problem.action_cost(node.state, action, s1)
+        return SMANode(s1, node, action, cost, index=i)
+
+    root = SMANode(problem.initial)
+    root.f = h(root)
+    root.in_queue = True
+    touch(root)
+    used, truncated = 1, False
+    while True:
+        n = top(best)
+        if n is None or n.f == math.inf:
+            return (cutoff if truncated else failure, {}, [])
+        if problem.is_goal(n.state):
+            return (n, {}, [])
+        s = next_successor(n)
+        if s is None:
+            n.in_queue = False
+            backup(n)
+            touch(n)
+            if n.leaf() and n.parent is not None:
+                forget(n)
+            continue
+        other = table.get(s.state)
+        if other is not None and other.path_cost <= s.path_cost:
+            s.f = math.inf # another node in memory reaches s.state at least as cheaply
+        elif not problem.is_goal(s.state) and s.depth >= max_nodes - 1:
+            s.f = math.inf
+            truncated = True
+        else:
+            table[s.state] = s
+            s.f = max(n.f, g(s) + h(s), n.forgotten.get(s.index, 0))
+        n.forgotten.pop(s.index, None)
+        n.children[s.index] = s
+        used += 1
+        backup(n)
+        if n.generated_all() and not any(f < math.inf for f in n.forgotten.values()):
+            n.in_queue = False
+        touch(n)
+        while used > max_nodes:
+            w = top(worst, exclude=n)
+            if w is None:
+                break
+            forget(w)
+        s.in_queue = True
+        touch(s)
+
+
+# Anytime search - weighted A* that returns a bounded-suboptimal solution fast,
+# then keeps lowering the weight and repairing the same search tree (ARA*).
+
+def anytime_astar_search(problem, h=None, weight=3.0, step=0.5, seconds=None, max_expansions=None, improved=None, stop=None):
+    """Anytime Repairing A*: a series of weighted A* searches with f(n) = g(n) + w * h(n),
+    starting at w = `weight` and lowering it by `step` down to 1. Each search reuses
+    the reached states of the last one: only nodes still in the frontier or improved
+    after being expanded (the "inconsistent" ones) are searched again. With an
+    admissible h each solution costs at most w times the optimum.
+    The search stops after `seconds` of wall-clock time or `max_expansions` expansions,
+    or once `stop()` returns true, returning the best solution so far. `improved(node, bound)` is called every time the
+    solution or its suboptimality bound improves.
+    Returns (node, reached, solutions), where solutions lists the (path cost, bound)
+    of each improvement; the node is `cutoff` if the budget ran out before any
+    solution was found, or `failure` if there is none."""
+    h = h or problem.h
+    deadline = None if seconds is None else time.perf_counter() + seconds
+    root = Node(problem.initial)
+    reached = {problem.initial: root}
+    best = root if problem.is_goal(root.state) else failure
+    solutions = []
+    reopen = [root]
+    expansions = 0
+    while True:
+        f = lambda n, w=weight: g(n) + w * h(n)
+        frontier = IndexedPriorityQueue(reopen, key=f)
+        expanded, inconsistent = set(), {}
+        while frontier and f(frontier.top()) < best.path_cost:
+            if (max_expansions is not None and expansions >= max_expansions or
+                    deadline is not None and time.perf_counter() >= deadline or
+                    stop is not None and stop()):
+                return (best if best is not failure else cutoff, reached, solutions)
+            node = frontier.pop()
+            expanded.add(node.state)
+            expansions += 1
+            for child in expand(problem, node):
+                s = child.state
+                if s not in reached or child.path_cost < reached[s].path_cost:
+                    reached[s] = child
+                    if problem.is_goal(s) and child.path_cost < best.path_cost:
+                        best = child
+                    if s in expanded:
+                        inconsistent[s] = child
+                    else:
+                        frontier.add(child)
+        reopen = [pair[1] for pair in frontier.get_items()] + list(inconsistent.values())
+        if best is not failure:
+            lowest = min((g(n) + h(n) for n in reopen), default=best.path_cost)
+            bound = min(weight, best.path_cost / lowest) if lowest > 0 else weight
+            solutions.append((best.path_cost, bound))
+            if improved:
+                improved(best, bound)
+        if weight <= 1 or not reopen:
+            return (best, reached, solutions)
+        weight = max(1, weight - step)
 
 
 # TODO: complete these function according to the documentation
@@ -153,29 +927,413 @@ def breadth_first_bfs(problem):
 # "BFS" for breadth_first_bfs
 # "UCS" for unit_form_cost
 # "RNS" for random_search
+# "BDU" for bidirectional_uniform_cost_search
+# "BDA" for bidirectional_astar_search
+# "AST" for astar_search
+# "GRS" for greedy_bfs
+# "ARA" for anytime_astar_search, run down to weight 1 (optimal)
+# "ARN" for uniform-cost search with the search tree in a NodeArena
+# "PRT" for portfolio_search with its default strategies and policy
+
+def random_search(problem, seed=None, block=256, trace='snapshots', stats=None):
+    """Expand frontier nodes in a uniformly random order by giving each node a random
+    priority. `seed` is an int, a SeedSequence or a np.random.Generator; with None
+    the module-level `rng` is used, so the result depends on its earlier draws.
+    A Generator passed in (or `rng`) gives one uniform() value per node, so it is
+    left just as far along as the search used it. A generator made from an int or
+    SeedSequence belongs to this call, and its priorities are drawn `block` at a
+    time instead: the same values, in the same order."""
+    generator = random_generator(seed)
+    if seed is None or generator is seed:
+        prio = lambda x: generator.uniform()
+    else:
+        priorities = random_priorities(generator, block)
+        prio = lambda x: next(priorities)
+    return best_first_search(problem,f=prio,trace=trace,stats=stats)
+
+def random_generator(seed=None):
+    "`seed` itself if it is a Generator, the module-level rng for None, else a new Generator seeded with it."
+    if seed is None:
+        return rng
+    if isinstance(seed, np.random.Generator):
+        return seed
+    return np.random.default_rng(seed)
+
+def random_priorities(generator, block=256):
+    "Uniform [0, 1) numbers from `generator`, drawn `block` at a time."
+    while True:
+        yield from generator.random(block).tolist()
 
-def random_search(problem):
-    prio = lambda x: rng.uniform()
-    return best_first_search(problem,f=prio)
+def spawn_generators(seed, n):
+    """n statistically independent Generators derived from `seed` (an int,
+    SeedSequence or Generator), e.g. one per random_search run in parallel."""
+    if isinstance(seed, np.random.Generator):
+        return seed.spawn(n)
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    return [np.random.default_rng(child) for child in seed.spawn(n)]
 
 def find_path(problem, search_algorithm):
     
+    if search_algorithm == "PRT":
+        return portfolio_search(problem)[1]
+    solution = run_search(problem, search_algorithm)
+    if solution is None:
+        return print("Unknown search aglorithm")
+    
+    return path_states(solution)
+
+def run_search(problem, search_algorithm, stats=None):
+    """Run the search with the given find_path code and return its solution node (None for an unknown code).
+    `stats` is passed on to the searches built on best_first_search, which record no
+    frontiers here since only the solution is used."""
     if search_algorithm == "BFS":
-        solution,_,frontiers = breadth_first_bfs(problem)
+        solution,_,frontiers = breadth_first_bfs(problem, stats=stats, trace=None)
     elif search_algorithm == "UCS":
-        solution,_,frontiers = uniform_cost_search(problem)
+        solution,_,frontiers = uniform_cost_search(problem, stats=stats, trace=None)
     elif search_algorithm == "RNS":
-        solution,_,frontiers = random_search(problem)
+        solution,_,frontiers = random_search(problem, stats=stats, trace=None)
+    elif search_algorithm == "BDU":
+        solution,_,frontiers = bidirectional_uniform_cost_search(problem)
+    elif search_algorithm == "BDA":
+        solution,_,frontiers = bidirectional_astar_search(problem)
+    elif search_algorithm == "AST":
+        solution,_,frontiers = astar_search(problem, stats=stats, trace=None)
+    elif search_algorithm == "GRS":
+        solution,_,frontiers = greedy_bfs(problem, stats=stats, trace=None)
+    elif search_algorithm == "ARA":
+        solution,_,frontiers = anytime_astar_search(problem)
+    elif search_algorithm == "ARN":
+        solution,_,frontiers = best_first_search(problem, f=g, stats=stats, arena=True)
     else:
-        return print("Unknown search aglorithm")
+        return None
+    return solution
+
+
+# Portfolio search - run several strategies at once in a pool of processes
+# and take the first acceptable answer.
+
+# Strategies whose solutions are optimal for any problem with positive action
+# costs. A* ("AST", "BDA", "ARA") is only optimal when problem.h is admissible,
+# which the 'straight' and 'manhattan' heuristics of the wrap-around grids are
+# not, and the bidirectional searches ("BDU", "BDA") also need every action to
+# be undoable at the same cost; pass such codes to portfolio_search as
+# `optimal` for problems where they hold.
+optimal_strategies = {"UCS"}
+
+def run_strategy(problem, search_algorithm):
+    "(code, path states, path cost) of one strategy's solution."
+    solution = run_search(problem, search_algorithm)
+    return (search_algorithm, path_states(solution), solution.path_cost)
+
+def portfolio_worker(results, problem, search_algorithm):
+    "Process target for portfolio_search: put run_strategy's result, or the exception it raised, on `results`."
+    try:
+        result = run_strategy(problem, search_algorithm)
+    except Exception as error:
+        try:
+            pickle.dumps(error)
+            result = error
+        except Exception:
+            result = RuntimeError('{} failed: {!r}'.format(search_algorithm, error))
+    results.put(result)
+
+def portfolio_result(results, workers, deadline):
+    """The next result put on `results` by the portfolio_search `workers`. Raises
+    queue.Empty once `deadline` passes, or once every worker has exited and
+    nothing is left to read (a worker killed from outside puts nothing)."""
+    while True:
+        wait = 0.1 if deadline is None else max(0, min(0.1, deadline - time.monotonic()))
+        try:
+            return results.get(timeout=wait)
+        except queue.Empty:
+            if deadline is not None and time.monotonic() >= deadline:
+                raise
+            if not any(worker.is_alive() for worker in workers) and results.empty():
+                raise
+
+def portfolio_search(problem, strategies=("BFS", "UCS", "AST", "GRS", "RNS"), policy="optimal", timeout=None,
+                     optimal=optimal_strategies):
+    """Run the find_path `strategies` in parallel, one process each, and return the
+    (code, path states, path cost) of the answer chosen by `policy`:
+        "first"   - the first solution found by any strategy
+        "optimal" - the first solution from a strategy in `optimal`, the codes
+                    known to be optimal for this problem (by default only "UCS");
+                    if none of those succeeds, the cheapest other solution
+    The remaining searches are cancelled by terminating their processes. Gives
+    (None, [], inf) if no strategy finds a solution within `timeout` seconds.
+    If every strategy that finished raised an exception, the first is re-raised.
+    The problem is pickled to the workers, so it must be picklable; pickle's
+    error is raised before any worker starts if it is not."""
+    pickle.dumps(problem)
+    results = multiprocessing.Queue()
+    deadline = None if timeout is None else time.monotonic() + timeout
+    best = (None, [], math.inf)
+    errors, answered = [], False
+    # One Process per strategy rather than a Pool: Pool.terminate() can hang for good
+    # when it kills a worker that holds the lock of the pool's task queue.
+    workers = [multiprocessing.Process(target=portfolio_worker, args=(results, problem, code), daemon=True)
+               for code in strategies]
+    try:
+        for worker in workers:
+            worker.start()
+        for _ in strategies:
+            try:
+                result = portfolio_result(results, workers, deadline)
+            except queue.Empty:
+                break
+            if isinstance(result, BaseException):
+                errors.append(result)
+                continue
+            answered = True
+            if not result[1]:
+                continue
+            if policy == "first" or result[0] in optimal:
+                return result
+            if result[2] < best[2]:
+                best = result
+    finally:
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+        for worker in workers:
+            if worker.pid is not None:
+                worker.join()
+        results.close()
+    if errors and not answered:
+        raise errors[0]
+    return best
+
+
+# Result cache - find_path answers kept in memory and on disk, keyed by a
+# content hash of the problem's map or grid plus the query.
+
+fingerprints = weakref.WeakKeyDictionary() # object -> content hash, for objects whose class sets immutable = True (such as a Map)
+
+# find_path codes whose answers can differ from call to call, so are never cached
+uncached_algorithms = {"RNS", "PRT"}
+
+def canonical(value):
+    """A deterministic, hashable form of `value`, with dicts and sets in sorted order.
+    Raises TypeError for a value with no form that is the same in every run,
+    rather than hashing a repr that holds its memory address."""
+    if isinstance(value, dict):
+        return ('dict',) + tuple(sorted(((canonical(k), canonical(v)) for k, v in value.items()), key=repr))
+    if isinstance(value, (set, frozenset)):
+        return ('set',) + tuple(sorted((canonical(v) for v in value), key=repr))
+    if isinstance(value, list) and value and isinstance(value[0], (list, tuple)):
+        try:
+            array = np.asarray(value) # a grid such as a land_grid hashes much faster as an array
+        except ValueError: # ragged rows
+            array = None
+        if array is not None and array.dtype.kind in 'biuf':
+            return canonical(array)
+    if isinstance(value, (list, tuple)):
+        return tuple(canonical(v) for v in value)
+    if isinstance(value, np.ndarray) and not value.dtype.hasobject:
+        return ('array', value.dtype.str, value.shape, value.tobytes())
+    if isinstance(value, np.ndarray):
+        return ('array', value.shape, canonical(value.tolist()))
+    if isinstance(value, memoryview):
+        return ('memoryview', value.format, value.shape, value.tobytes())
+    if isinstance(value, (type(None), bool, int, float, complex, str, bytes, range, np.generic)):
+        return value
+    if hasattr(value, '__dict__') and not callable(value):
+        return fingerprint(value)
+    raise TypeError('cannot fingerprint {!r} object'.format(type(value).__name__))
+
+def fingerprint(obj, exclude=()):
+    """A SHA-256 content hash of obj's class and attributes, except those named in
+    `exclude`. Objects whose class sets `immutable = True`, such as a Map, have
+    their hash remembered, so they must not be changed once fingerprinted; every
+    other object (such as an OccupancyGrid, which has add() and discard()) is
+    hashed again on each call."""
+    remember = not exclude and getattr(type(obj), 'immutable', False)
+    if remember and obj in fingerprints:
+        return fingerprints[obj]
+    items = {k: v for k, v in vars(obj).items() if k not in exclude and not callable(v)}
+    cls = type(obj)
+    digest = hashlib.sha256(repr((cls.__module__, cls.__qualname__, canonical(items))).encode()).hexdigest()
+    if remember:
+        try:
+            fingerprints[obj] = digest
+        except TypeError:
+            pass
+    return digest
+
+def query_key(problem, search_algorithm):
+    """A hash of the problem's class and content, initial state, goal and heuristic,
+    and the search algorithm."""
+    grid = fingerprint(problem, exclude=('initial', 'goal', 'heuristic', 'table'))
+    query = (grid, problem.initial, problem.goal, search_algorithm, getattr(problem, 'heuristic', None))
+    return hashlib.sha256(repr(query).encode()).hexdigest()
+
+class ResultCache:
+    """Caches the paths returned by find_path. A query is keyed by a hash of the
+    problem's class and its map, land grid, obstacles and other attributes, with its
+    initial state, goal, search algorithm and heuristic. The `maxsize` most
+    recently used answers are kept in memory. If `directory` is given, every
+    answer is also pickled to a file there, so it can be reused by other
+    processes and after restarts. The answers of `uncached_algorithms`, random search
+    ("RNS") and portfolio search ("PRT", which depends on which process finishes
+    first), are never cached."""
+
+    def __init__(self, directory=None, maxsize=1024):
+        self.directory = directory
+        self.maxsize = maxsize
+        self.memory = {} # key -> path states, least recently used first
+        self.hits = self.misses = 0
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def key(self, problem, search_algorithm): return query_key(problem, search_algorithm)
+
+    def find_path(self, problem, search_algorithm):
+        "find_path(problem, search_algorithm), answered from the cache when possible."
+        if search_algorithm in uncached_algorithms:
+            return find_path(problem, search_algorithm)
+        key = self.key(problem, search_algorithm)
+        path = self.get(key)
+        if path is None:
+            self.misses += 1
+            path = find_path(problem, search_algorithm)
+            if path is not None:
+                self.put(key, path)
+        else:
+            self.hits += 1
+        return path
+
+    def get(self, key):
+        if key in self.memory:
+            self.memory[key] = path = self.memory.pop(key)
+            return path
+        if self.directory is not None:
+            try:
+                with open(os.path.join(self.directory, key + '.pkl'), 'rb') as file:
+                    path = pickle.load(file)
+            except (OSError, EOFError, pickle.UnpicklingError):
+                return None
+            self.remember(key, path)
+            return path
+        return None
+
+    def put(self, key, path):
+        self.remember(key, path)
+        if self.directory is not None:
+            filename = os.path.join(self.directory, key + '.pkl')
+            temporary = '{}.{}.tmp'.format(filename, os.getpid())
+            with open(temporary, 'wb') as file:
+                pickle.dump(path, file)
+            os.replace(temporary, filename) # atomic, so readers never see a partial file
+
+    def remember(self, key, path):
+        self.memory[key] = path
+        while len(self.memory) > self.maxsize:
+            del self.memory[next(iter(self.memory))]
+
+    def clear(self):
+        "Forget every answer, in memory and on disk."
+        self.memory.clear()
+        if self.directory is not None:
+            for name in os.listdir(self.directory):
+                if name.endswith('.pkl'):
+                    os.remove(os.path.join(self.directory, name))
     
-    if path_states(solution):
-        return path_states(solution)
+
+
+# Search service - find_path for asyncio programs. Searches run in an executor
+# so they never block the event loop, identical requests in flight share one
+# search, and a search nobody waits for any more is interrupted.
+
+class SearchInterrupted(Exception):
+    "Raised inside a SearchService search when no request is waiting for it any more."
+
+class SearchJob:
+    "A search in flight: its future, the number of requests waiting, its stop flag and best path so far."
+    def __init__(self):
+        self.future, self.waiters, self.stop, self.best = None, 0, threading.Event(), None
+
+def interruptible_find_path(problem, search_algorithm, job):
+    """find_path, stopping with SearchInterrupted soon after job.stop is set. The
+    best_first_search algorithms check the flag on every expansion, and "ARA" records
+    each improved solution in job.best; the other algorithms, including "PRT", always
+    run to the end. Raises ValueError for a code find_path does not know."""
+    def check(node):
+        if job.stop.is_set():
+            raise SearchInterrupted()
+    if search_algorithm == "PRT":
+        path = portfolio_search(problem)[1]
+    elif search_algorithm == "ARA":
+        def improved(node, bound): job.best = path_states(node)
+        path = path_states(anytime_astar_search(problem, improved=improved, stop=job.stop.is_set)[0])
     else:
-        return []
-    
+        solution = run_search(problem, search_algorithm, stats=SearchStats(on_expand=check))
+        if solution is None:
+            raise ValueError('unknown search algorithm {!r}'.format(search_algorithm))
+        path = path_states(solution)
+    if job.stop.is_set():
+        raise SearchInterrupted()
+    return path
+
+class SearchService:
+    """An asyncio front end to find_path:
+        path = await service.find_path(problem, "AST", timeout=0.5)
+    Searches, and the hashing of problems into query keys, run in `executor` (the
+    event loop's default executor if None), so the event loop keeps running while
+    they work. The executor must run its work in threads of this process, such as
+    a ThreadPoolExecutor, since a search is stopped through a threading.Event; a
+    ProcessPoolExecutor is rejected with TypeError. Requests for the same problem
+    content, states and algorithm that are in flight together share one search.
+    A request that is cancelled, or that passes its `timeout`, stops waiting. Once
+    no request is waiting, the search itself is interrupted. A request that times
+    out gets the best solution found so far ("ARA" only), or `cutoff`.
+    If a ResultCache is given, answers are looked up in it and stored in it."""
+
+    def __init__(self, executor=None, cache=None):
+        if isinstance(executor, concurrent.futures.ProcessPoolExecutor):
+            raise TypeError('SearchService needs an executor that runs in threads, not processes')
+        self.executor = executor
+        self.cache = cache
+        self.jobs = {} # query key -> SearchJob
+
+    async def find_path(self, problem, search_algorithm, timeout=None):
+        loop = asyncio.get_running_loop()
+        key = await loop.run_in_executor(self.executor, query_key, problem, search_algorithm) # hashing a big grid takes a while
+        if self.cache is not None and search_algorithm not in uncached_algorithms:
+            path = self.cache.get(key)
+            if path is not None:
+                return path
+        job = self.jobs.get(key)
+        if job is None:
+            job = self.jobs[key] = SearchJob()
+            job.future = loop.run_in_executor(self.executor, interruptible_find_path, problem, search_algorithm, job)
+            job.future.add_done_callback(lambda future: self.finished(key, job, search_algorithm))
+        job.waiters += 1
+        try:
+            return await asyncio.wait_for(asyncio.shield(job.future), timeout)
+        except asyncio.TimeoutError:
+            return job.best if job.best is not None else cutoff
+        finally:
+            job.waiters -= 1
+            if job.waiters == 0 and not job.future.done():
+                job.stop.set()
+                if self.jobs.get(key) is job:
+                    del self.jobs[key] # later requests start a new search
+
+    def finished(self, key, job, search_algorithm):
+        if self.jobs.get(key) is job:
+            del self.jobs[key]
+        if job.future.cancelled() or job.future.exception() is not None:
+            return
+        path = job.future.result()
+        if self.cache is not None and path is not None and search_algorithm not in uncached_algorithms:
+            self.cache.put(key, path)
+
 
 def frontier_lengths(frontiers):
+    "For a FrontierLog, the frontier size at every iteration; other frontiers are returned as is."
+    if isinstance(frontiers, FrontierLog):
+        return frontiers.lengths()
     return frontiers
 
 
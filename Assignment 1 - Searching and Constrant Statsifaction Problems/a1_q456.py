@@ -2,8 +2,17 @@ import random
 import heapq
 import math
 import sys
+import os
+import csv
+import pickle
+import copy
+import hashlib
+import time
+import multiprocessing
+from multiprocessing import shared_memory
 from collections import defaultdict, deque, Counter
 from itertools import combinations
+from array import array
 import numpy as np 
 
 # initialize random number generator for consistency 
@@ -32,10 +41,11 @@ class Problem(object):
 class Node:
     "A Node in a search tree."
     def __init__(self, state, parent=None, action=None, path_cost=0):
-        self.__dict__.update(state=state, parent=parent, action=action, path_cost=path_cost)
+        depth = 0 if parent is None else parent.depth + 1
+        self.__dict__.update(state=state, parent=parent, action=action, path_cost=path_cost, depth=depth)
 
     def __repr__(self): return '<{}>'.format(self.state)
-    def __len__(self): return 0 if self.parent is None else (1 + len(self.parent))
+    def __len__(self): return self.depth
     def __lt__(self, other): return self.path_cost < other.path_cost
     
 failure = Node('failure', path_cost=math.inf) # Indicates an algorithm couldn't find a solution.
@@ -51,15 +61,28 @@ def expand(problem, node):
         
 def path_actions(node):
     "The sequence of actions to get to this node."
-    if node.parent is None:
-        return []  
-    return path_actions(node.parent) + [node.action]
+    actions = [n.action for n in path_nodes_reversed(node) if n.parent is not None]
+    actions.reverse()
+    return actions
 
 def path_states(node):
     "The sequence of states to get to this node."
-    if node in (cutoff, failure, None): 
-        return []
-    return path_states(node.parent) + [node.state]
+    states = list(path_states_reversed(node))
+    states.reverse()
+    return states
+
+def path_nodes_reversed(node):
+    "Yield the nodes on the path to this node, from `node` back to the root."
+    if node in (cutoff, failure): 
+        return
+    while node is not None:
+        yield node
+        node = node.parent
+
+def path_states_reversed(node):
+    "Yield the states on the path to this node, from its state back to the initial state."
+    for n in path_nodes_reversed(node):
+        yield n.state
 
 
 # PriorityQueue - note 
@@ -95,57 +118,390 @@ class PriorityQueue:
     def __len__(self): return len(self.items)
 
 
+class IndexedPriorityQueue(PriorityQueue):
+    """A PriorityQueue that holds at most one item per `index(item)` (by default the
+    node's state). Adding an item whose index is already queued replaces the old one:
+    the old heap pair is marked removed and skipped when popped (lazy deletion), and
+    the heap is rebuilt whenever removed pairs outnumber live ones.
+    Ties are still broken by insertion order via `item_count`."""
+
+    removed = object() # placeholder for the item of a replaced pair
+
+    def __init__(self, items=(), key=lambda x: x, index=lambda item: item.state):
+        self.index = index
+        self.entries = {} # index -> live [score, item] pair in the heap
+        self.stale = 0
+        PriorityQueue.__init__(self, items, key)
+
+    def add(self, item):
+        """Add item to the queue, replacing any queued item with the same index."""
+        i = self.index(item)
+        old = self.entries.pop(i, None)
+        if old is not None:
+            old[1] = self.removed
+            self.stale += 1
+        pair = [(self.key(item), self.item_count), item]
+        self.entries[i] = pair
+        heapq.heappush(self.items, pair)
+        self.item_count += 1
+        if self.stale > len(self.entries):
+            self.compact()
+
+    def pop(self):
+        """Pop and return the live item with min f(item) value."""
+        self.drop_removed()
+        item = heapq.heappop(self.items)[1]
+        del self.entries[self.index(item)]
+        return item
+
+    def top(self):
+        self.drop_removed()
+        return self.items[0][1]
+
+    def drop_removed(self):
+        "Discard removed pairs from the top of the heap."
+        while self.items and self.items[0][1] is self.removed:
+            heapq.heappop(self.items)
+            self.stale -= 1
+
+    def compact(self):
+        "Rebuild the heap without removed pairs."
+        self.items = [pair for pair in self.items if pair[1] is not self.removed]
+        heapq.heapify(self.items)
+        self.stale = 0
+
+    def get_items(self):
+        return [tuple(pair) for pair in self.items if pair[1] is not self.removed]
+
+    def __len__(self): return len(self.entries)
+
+
+class BucketQueue(PriorityQueue):
+    """A PriorityQueue for searches with few distinct priorities at a time, such
+    as path costs built from small integer action costs, or depths. Items are kept
+    in first-in first-out buckets, one per priority, with a small heap of the
+    priorities in use (Dial's algorithm without a fixed bucket array), so adding
+    and popping cost O(1) plus O(log buckets). Items are popped in exactly the same
+    order as from a PriorityQueue. If more than `max_buckets` priorities are ever
+    in use at once, the queue turns itself into an ordinary PriorityQueue heap."""
+
+    def __init__(self, items=(), key=lambda x: x, max_buckets=64):
+        self.buckets = {} # priority -> deque of (count, item); None once a heap
+        self.priorities = [] # heap of the priorities with a non-empty bucket
+        self.max_buckets = max_buckets
+        self.size = 0
+        PriorityQueue.__init__(self, items, key)
+
+    def add(self, item):
+        """Add item to the queue."""
+        if self.buckets is None:
+            return PriorityQueue.add(self, item)
+        score = self.key(item)
+        bucket = self.buckets.get(score)
+        if bucket is None:
+            if len(self.priorities) >= self.max_buckets:
+                self.to_heap()
+                return PriorityQueue.add(self, item)
+            bucket = self.buckets[score] = deque()
+            heapq.heappush(self.priorities, score)
+        bucket.append((self.item_count, item))
+        self.item_count += 1
+        self.size += 1
+
+    def pop(self):
+        """Pop and return the item with min f(item) value."""
+        if self.buckets is None:
+            return PriorityQueue.pop(self)
+        score = self.priorities[0]
+        bucket = self.buckets[score]
+        count, item = bucket.popleft()
+        if not bucket:
+            heapq.heappop(self.priorities)
+            del self.buckets[score]
+        self.size -= 1
+        return item
+
+    def top(self):
+        if self.buckets is None:
+            return PriorityQueue.top(self)
+        return self.buckets[self.priorities[0]][0][1]
+
+    def to_heap(self):
+        "Move every item into the PriorityQueue heap, keeping their counts."
+        self.items = [((score, count), item) for score, bucket in self.buckets.items() for count, item in bucket]
+        heapq.heapify(self.items)
+        self.buckets = None
+
+    def get_items(self):
+        if self.buckets is None:
+            return PriorityQueue.get_items(self)
+        return [((score, count), item) for score in sorted(self.buckets) for count, item in self.buckets[score]]
+
+    def __len__(self): return len(self.items) if self.buckets is None else self.size
+
+
+# Search statistics - counters that best_first_search fills in when it is
+# given a SearchStats; with stats=None nothing is counted or timed.
+
+class SearchStats:
+    """Counters for one best-first search:
+        expanded       - nodes taken off the frontier and expanded
+        pushed         - children added to the frontier
+        duplicates     - pushes for a state that was already reached (by a costlier path)
+        pruned         - children dropped because their state was reached as cheaply
+        peak_frontier  - the largest number of frontier entries
+        evaluations    - calls of the priority function f, and
+        evaluation_seconds - the time spent in them (which is mostly the heuristic)
+        seconds        - the wall-clock time of the whole search
+    The optional hooks on_expand(node) and on_push(node) are called as nodes are
+    expanded and pushed."""
+
+    def __init__(self, on_expand=None, on_push=None):
+        self.on_expand, self.on_push = on_expand, on_push
+        self.expanded = self.pushed = self.duplicates = self.pruned = 0
+        self.peak_frontier = self.evaluations = 0
+        self.seconds = self.evaluation_seconds = 0.0
+
+    def timed(self, f):
+        "Wrap the priority function f so its calls are counted and timed."
+        def timed_f(node):
+            t = time.perf_counter()
+            value = f(node)
+            self.evaluation_seconds += time.perf_counter() - t
+            self.evaluations += 1
+            return value
+        return timed_f
+
+    def start(self): self.started = time.perf_counter()
+    def stop(self):  self.seconds += time.perf_counter() - self.started
+
+    def expand(self, node):
+        self.expanded += 1
+        if self.on_expand: self.on_expand(node)
+
+    def push(self, node, duplicate):
+        self.pushed += 1
+        self.duplicates += duplicate
+        if self.on_push: self.on_push(node)
+
+    @property
+    def generated(self): return self.pushed + self.pruned
+
+    @property
+    def seconds_per_expansion(self): return self.seconds / max(self.expanded, 1)
+
+    def as_dict(self):
+        names = ('expanded', 'generated', 'pushed', 'duplicates', 'pruned', 'peak_frontier',
+                 'evaluations', 'evaluation_seconds', 'seconds', 'seconds_per_expansion')
+        return {name: getattr(self, name) for name in names}
+
+    def __repr__(self):
+        return 'SearchStats({})'.format(', '.join('{}={:.6g}'.format(*item) for item in self.as_dict().items()))
+
+
 # Different search algorithms 
 # defined by appropriate definition of priorities 
 
 
-def best_first_search(problem, f):
-    "Search nodes with minimum f(node) value first."
+def best_first_search(problem, f, frontier_type=BucketQueue, stats=None, arena=False):
+    """Search nodes with minimum f(node) value first.
+    With arena=True the search tree is kept in a NodeArena instead of one Node per
+    child (see arena_best_first_search); `frontier_type` is then unused and
+    `reached` is the arena.
+    Pass frontier_type=IndexedPriorityQueue to replace, rather than duplicate,
+    frontier entries for states that are reached again by a cheaper path.
+    The default BucketQueue is faster when f takes few distinct values (such as
+    small integer path costs) and falls back to a heap otherwise.
+    Pass a SearchStats as `stats` to collect counters and timings."""
+    if arena:
+        return arena_best_first_search(problem, f, stats)
+    if stats is not None:
+        stats.start()
+        f = stats.timed(f)
     node = Node(problem.initial)
-    frontier = PriorityQueue([node], key=f)
+    frontier = frontier_type([node], key=f)
     reached = {problem.initial: node}
     frontiers = [] 
     while frontier:
         node = frontier.pop()
         
         if problem.is_goal(node.state):
+            if stats is not None: stats.stop()
             return (node,reached,frontiers)
-        for child in expand(problem, node):
-            s = child.state
-            if s not in reached or child.path_cost < reached[s].path_cost:
-                reached[s] = child
-                frontier.add(child)
+        if stats is None:
+            for child in expand(problem, node):
+                s = child.state
+                if s not in reached or child.path_cost < reached[s].path_cost:
+                    reached[s] = child
+                    frontier.add(child)
+        else:
+            stats.expand(node)
+            for child in expand(problem, node):
+                s = child.state
+                if s not in reached or child.path_cost < reached[s].path_cost:
+                    stats.push(child, s in reached)
+                    reached[s] = child
+                    frontier.add(child)
+                else:
+                    stats.pruned += 1
+            stats.peak_frontier = max(stats.peak_frontier, len(frontier))
         
+    if stats is not None: stats.stop()
     return (failure, reached, frontiers)
 
 def g(n): return n.path_cost
 
-def astar_search(problem, h=None):
+def astar_search(problem, h=None, stats=None):
     """Search nodes with minimum f(n) = g(n) + h(n)."""
     h = h or problem.h
-    return best_first_search(problem, f=lambda n: g(n) + h(n))
+    return best_first_search(problem, f=lambda n: g(n) + h(n), stats=stats)
         
-def greedy_bfs(problem, h=None):
+def greedy_bfs(problem, h=None, stats=None):
     """Search nodes with minimum h(n)."""
     h = h or problem.h
-    return best_first_search(problem, f=h)
+    return best_first_search(problem, f=h, stats=stats)
 
-def uniform_cost_search(problem):
+def uniform_cost_search(problem, stats=None):
     "Search nodes with minimum path cost first."
-    return best_first_search(problem, f=g)
+    return best_first_search(problem, f=g, stats=stats)
 
-def breadth_first_bfs(problem):
+def breadth_first_bfs(problem, stats=None):
     "Search shallowest nodes in the search tree first; using best-first."
-    return best_first_search(problem, f=len)
+    return best_first_search(problem, f=len, stats=stats)
     
 
 
+# Node arena - a compact alternative to building one `Node` per child.
+# The search tree is kept in parallel arrays indexed by node number,
+# and `Node` objects are only built for the solution that is returned.
+
+class NodeArena:
+    """A search tree stored as parallel arrays of state id, parent index, action,
+    path cost and depth. States are interned to integer ids, so each state is
+    stored once, and `best[state id]` is the index of the cheapest node reaching it
+    (this plays the part of the `reached` dict)."""
+
+    def __init__(self):
+        self.ids = {}               # state -> state id
+        self.states = []            # state id -> state
+        self.best = array('q')      # state id -> index of best node, -1 if none
+        self.state = array('q')     # node index -> state id
+        self.parent = array('q')    # node index -> parent node index, -1 for the root
+        self.action = []            # node index -> action
+        self.path_cost = []         # node index -> path cost (a list, so integer costs stay integers)
+        self.depth = array('q')     # node index -> number of actions from the root
+
+    def intern(self, state):
+        """Return the integer id of `state`, adding it if it is new."""
+        sid = self.ids.get(state)
+        if sid is None:
+            sid = self.ids[state] = len(self.states)
+            self.states.append(state)
+            self.best.append(-1)
+        return sid
+
+    def add(self, sid, parent=-1, action=None, path_cost=0):
+        """Add a node for state id `sid` and return its index."""
+        i = len(self.state)
+        self.state.append(sid)
+        self.parent.append(parent)
+        self.action.append(action)
+        self.path_cost.append(path_cost)
+        self.depth.append(0 if parent < 0 else self.depth[parent] + 1)
+        return i
+
+    def node(self, i):
+        "Materialise the `Node` chain from the root to node `i`."
+        chain = []
+        while i >= 0:
+            chain.append(i)
+            i = self.parent[i]
+        node = None
+        for j in reversed(chain):
+            node = Node(self.states[self.state[j]], node, self.action[j], self.path_cost[j])
+        return node
+
+    def reached(self):
+        "A {state: Node} dict like the one built by `best_first_search` (costly on big trees)."
+        return {s: self.node(self.best[sid]) for sid, s in enumerate(self.states) if self.best[sid] >= 0}
+
+    def __len__(self): return len(self.state)
+
+
+class ArenaNode:
+    """A `Node`-like view of one entry in a `NodeArena`, so priority functions
+    such as `g`, `len` and `problem.h` work unchanged on arena nodes."""
+    __slots__ = ('arena', 'index')
+
+    def __init__(self, arena, index):
+        self.arena, self.index = arena, index
+
+    @property
+    def state(self): return self.arena.states[self.arena.state[self.index]]
+    @property
+    def action(self): return self.arena.action[self.index]
+    @property
+    def path_cost(self): return self.arena.path_cost[self.index]
+    @property
+    def parent(self):
+        p = self.arena.parent[self.index]
+        return None if p < 0 else ArenaNode(self.arena, p)
+
+    def __repr__(self): return '<{}>'.format(self.state)
+    def __len__(self): return self.arena.depth[self.index]
+    def __lt__(self, other): return self.path_cost < other.path_cost
+
+
+def arena_best_first_search(problem, f, stats=None):
+    """Search nodes with minimum f(node) value first, keeping the search tree in a
+    `NodeArena`. Returns (node, arena, frontiers) where only `node` and its
+    ancestors are real `Node` objects; `arena.reached()` rebuilds the reached dict.
+    This is what best_first_search(problem, f, arena=True) runs. The hooks of a
+    SearchStats passed as `stats` get ArenaNode views rather than Nodes."""
+    if stats is not None:
+        stats.start()
+        f = stats.timed(f)
+    arena = NodeArena()
+    view = ArenaNode(arena, arena.add(arena.intern(problem.initial)))
+    arena.best[0] = 0
+    frontier = [(f(view), 0, 0)] # a heap of (score, count, node index) triples
+    count = 1
+    while frontier:
+        i = heapq.heappop(frontier)[2]
+        s = arena.states[arena.state[i]]
+        if problem.is_goal(s):
+            if stats is not None: stats.stop()
+            return (arena.node(i), arena, [])
+        if stats is not None:
+            stats.expand(ArenaNode(arena, i))
+        cost = arena.path_cost[i]
+        for action in problem.actions(s):
+            s1 = problem.result(s, action)
+            cost1 = cost + problem.action_cost(s, action, s1)
+            sid = arena.intern(s1)
+            j = arena.best[sid]
+            if j < 0 or cost1 < arena.path_cost[j]:
+                view.index = arena.best[sid] = arena.add(sid, i, action, cost1)
+                heapq.heappush(frontier, (f(view), count, view.index))
+                count += 1
+                if stats is not None: stats.push(ArenaNode(arena, view.index), j >= 0)
+            elif stats is not None:
+                stats.pruned += 1
+        if stats is not None:
+            stats.peak_frontier = max(stats.peak_frontier, len(frontier))
+
+    if stats is not None: stats.stop()
+    return (failure, arena, [])
+
+
 class Map:
     """A map of places in a 2D world: a graph with vertexes and links between them. 
     In `Map(links, locations)`, `links` can be either [(v1, v2)...] pairs, 
     or a {(v1, v2): distance...} dict. Optional `locations` can be {v1: (x, y)} 
     If `directed=False` then for every (v1, v2) link, we add a (v2, v1) link."""
 
+    immutable = True # never changed once built, so a ResultCache may remember its fingerprint
+
     def __init__(self, links, locations=None, directed=False):
         if not hasattr(links, 'items'): # Distances are 1 by default
             links = {link: 1 for link in links}
@@ -156,6 +512,24 @@ class Map:
         self.neighbors = multimap(links)
         self.locations = locations or defaultdict(lambda: (0, 0))
 
+    def shortest_paths(self, source):
+        """Dijkstra's algorithm from `source` to every place it can reach. Returns
+        ({place: distance}, {place: predecessor on a shortest route from source})."""
+        distances, predecessors = {source: 0}, {}
+        frontier = [(0, 0, source)] # a heap of (distance, count, place) triples
+        count = 1
+        while frontier:
+            d, _, v = heapq.heappop(frontier)
+            if d > distances[v]:
+                continue
+            for v1 in self.neighbors.get(v, ()):
+                d1 = d + self.distances[v, v1]
+                if d1 < distances.get(v1, math.inf):
+                    distances[v1], predecessors[v1] = d1, v
+                    heapq.heappush(frontier, (d1, count, v1))
+                    count += 1
+        return distances, predecessors
+
         
 def multimap(pairs) -> dict:
     "Given (key, val) pairs, make a dict of {key: [val,...]}."
@@ -192,6 +566,401 @@ def straight_line_distance(A, B):
     "Straight-line distance between two points."
     return sum(abs(a - b)**2 for (a, b) in zip(A, B)) ** 0.5
     
+
+class RouteQueryEngine:
+    """Answers many route queries on one Map from cached one-to-all shortest-path
+    trees (see `Map.shortest_paths`) instead of a fresh search per query. Trees are
+    kept least recently used first and evicted once they hold more than
+    `max_entries` vertexes in total."""
+
+    def __init__(self, map, max_entries=1000000):
+        self.map = map
+        self.max_entries = max_entries
+        self.trees = {} # source -> (distances, predecessors)
+        self.entries = 0
+
+    def tree(self, source):
+        "The (distances, predecessors) tables for `source`, from the cache if possible."
+        if source in self.trees:
+            self.trees[source] = tree = self.trees.pop(source)
+            return tree
+        tree = self.map.shortest_paths(source)
+        self.trees[source] = tree
+        self.entries += len(tree[0])
+        while self.entries > self.max_entries and len(self.trees) > 1:
+            oldest = next(iter(self.trees))
+            self.entries -= len(self.trees.pop(oldest)[0])
+        return tree
+
+    def query(self, source, target):
+        """The (cost, path) of the shortest route from source to target, where path
+        is the list of places visited; (inf, []) if there is none."""
+        distances, predecessors = self.tree(source)
+        if target not in distances:
+            return (math.inf, [])
+        path = [target]
+        while path[-1] != source:
+            path.append(predecessors[path[-1]])
+        path.reverse()
+        return (distances[target], path)
+
+    def batch(self, queries):
+        """Answer a list of queries, each a RouteProblem or an (initial, goal) pair,
+        returning their (cost, path) results in order. Queries are grouped by
+        source so each tree is built at most once per batch."""
+        pairs = [(q.initial, q.goal) if isinstance(q, Problem) else q for q in queries]
+        by_source = defaultdict(list)
+        for i, (source, target) in enumerate(pairs):
+            by_source[source].append(i)
+        results = [None] * len(pairs)
+        for source, indexes in by_source.items():
+            for i in indexes:
+                results[i] = self.query(source, pairs[i][1])
+        return results
+    
+    
+class ContractionHierarchy:
+    """A contraction hierarchy built from a static Map, for fast point-to-point
+    route queries. Preprocessing contracts the places one at a time, least
+    important first (by edge difference), adding a shortcut u -> w through each
+    contracted place v when no witness path shorter than u -> v -> w remains.
+    A query is then a bidirectional Dijkstra search that only follows edges
+    towards more important places, settling a few places instead of a large part
+    of the map; shortcuts are unpacked into original Map links afterwards.
+    Works on directed and undirected Maps; save() and load() persist the result."""
+
+    def __init__(self, map, max_settled=50):
+        self.places = list(set(map.neighbors) | {v for vs in map.neighbors.values() for v in vs})
+        self.ids = {v: i for i, v in enumerate(self.places)}
+        n = len(self.places)
+        out = [{} for _ in range(n)] # remaining graph, place id -> {place id: distance}
+        inn = [{} for _ in range(n)]
+        for (v1, v2), d in map.distances.items():
+            i, j = self.ids[v1], self.ids[v2]
+            if i != j and d < out[i].get(j, math.inf):
+                out[i][j] = inn[j][i] = d
+        self.rank = [0] * n
+        self.up = [[] for _ in range(n)]   # i -> [(j, d)] for edges i -> j with rank[j] > rank[i]
+        self.down = [[] for _ in range(n)] # j -> [(i, d)] for edges i -> j with rank[i] > rank[j]
+        self.middle = {} # (i, j) -> place contracted between i and j by the shortcut i -> j
+
+        def shortcuts(v):
+            "The shortcuts (u, w, distance) needed to contract v."
+            needed = []
+            for u, du in inn[v].items():
+                limit = du + max((d for w, d in out[v].items() if w != u), default=0)
+                dist, frontier, settled = {u: 0}, [(0, u)], 0
+                while frontier and settled < max_settled:
+                    d, x = heapq.heappop(frontier)
+                    if d > limit:
+                        break
+                    if d > dist[x]:
+                        continue
+                    settled += 1
+                    for y, dy in out[x].items():
+                        if y != v and d + dy < dist.get(y, math.inf):
+                            dist[y] = d + dy
+                            heapq.heappush(frontier, (d + dy, y))
+                for w, dw in out[v].items():
+                    if w != u and dist.get(w, math.inf) > du + dw:
+                        needed.append((u, w, du + dw))
+            return needed
+
+        deleted = [0] * n # number of contracted neighbours of each place
+        def priority(v):
+            return len(shortcuts(v)) - len(inn[v]) - len(out[v]) + deleted[v]
+
+        queue = [(priority(v), v) for v in range(n)]
+        heapq.heapify(queue)
+        for r in range(n):
+            while True:
+                _, v = heapq.heappop(queue)
+                p = priority(v)
+                if not queue or p <= queue[0][0]:
+                    break
+                heapq.heappush(queue, (p, v))
+            self.rank[v] = r
+            for u, w, d in shortcuts(v):
+                if d < out[u].get(w, math.inf):
+                    out[u][w] = inn[w][u] = d
+                    self.middle[u, w] = v
+            for w, d in out[v].items():
+                self.up[v].append((w, d))
+                del inn[w][v]
+                deleted[w] += 1
+            for u, d in inn[v].items():
+                self.down[v].append((u, d))
+                del out[u][v]
+                deleted[u] += 1
+            out[v], inn[v] = {}, {}
+
+    def route(self, source, target, settled=None):
+        """The (cost, path) of the shortest route from source to target, where path
+        is the list of places visited; (inf, []) if there is none. If `settled` is
+        a set, the places the query settles (from either side) are added to it."""
+        if source == target:
+            return (0, [source])
+        if source not in self.ids or target not in self.ids:
+            return (math.inf, [])
+        s, t = self.ids[source], self.ids[target]
+        dist = ({s: 0}, {t: 0})
+        pred = ({}, {})
+        frontiers = ([(0, s)], [(0, t)])
+        edges = (self.up, self.down)
+        best, meet = math.inf, None
+        while frontiers[0] or frontiers[1]:
+            side = 0 if frontiers[0] and (not frontiers[1] or frontiers[0][0] <= frontiers[1][0]) else 1
+            d, v = heapq.heappop(frontiers[side])
+            if d >= best:
+                frontiers[side].clear()
+                continue
+            if d > dist[side][v]:
+                continue
+            if settled is not None:
+                settled.add(self.places[v])
+            if v in dist[1 - side] and d + dist[1 - side][v] < best:
+                best, meet = d + dist[1 - side][v], v
+            for w, dw in edges[side][v]:
+                if d + dw < dist[side].get(w, math.inf):
+                    dist[side][w], pred[side][w] = d + dw, v
+                    heapq.heappush(frontiers[side], (d + dw, w))
+        if meet is None:
+            return (math.inf, [])
+        links = []
+        v = meet
+        while v != s:
+            links.append((pred[0][v], v))
+            v = pred[0][v]
+        links.reverse()
+        v = meet
+        while v != t:
+            links.append((v, pred[1][v]))
+            v = pred[1][v]
+        return (best, [self.places[i] for i in self.unpack(s, links)])
+
+    def unpack(self, s, links):
+        "The place ids along a list of (possibly shortcut) links starting at s."
+        path = [s]
+        stack = list(reversed(links))
+        while stack:
+            i, j = stack.pop()
+            if (i, j) in self.middle:
+                v = self.middle[i, j]
+                stack.extend([(v, j), (i, v)])
+            else:
+                path.append(j)
+        return path
+
+    def search(self, problem):
+        """Solve a RouteProblem on the Map this hierarchy was built from. Returns
+        (node, reached, frontiers) like best_first_search, except that `reached` is
+        the set of places the query settled."""
+        settled = set()
+        cost, path = self.route(problem.initial, problem.goal, settled)
+        if not path:
+            return (failure, settled, [])
+        node = Node(path[0])
+        for s1 in path[1:]:
+            node = Node(s1, node, s1, node.path_cost + problem.action_cost(node.state, s1, s1))
+        return (node, settled, [])
+
+    def save(self, filename):
+        "Write the hierarchy to a file."
+        with open(filename, 'wb') as file:
+            pickle.dump(self.__dict__, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, filename):
+        "Read a hierarchy written by save()."
+        hierarchy = cls.__new__(cls)
+        with open(filename, 'rb') as file:
+            hierarchy.__dict__.update(pickle.load(file))
+        return hierarchy
+    
+    
+class CSRMap:
+    """A Map stored in compressed sparse row form. Places are numbered 0..n-1
+    (`places[i]` is the name of place i and `ids` maps names back); the links out
+    of place i are the edges offsets[i] to offsets[i+1] - 1, and edge e leads to
+    place targets[e] at distance weights[e]. Like a Map built with directed=True,
+    every direction of a link is stored explicitly. The arrays are NumPy arrays;
+    the `*_view` memoryviews give fast element access from Python. If `places` is
+    a range the places are just numbered, and `places` and `ids` are both that range."""
+
+    immutable = True # never changed once built, so a ResultCache may remember its fingerprint
+
+    def __init__(self, places, offsets, targets, weights, locations=None):
+        if isinstance(places, range):
+            self.places = self.ids = places
+        else:
+            self.places = list(places)
+            self.ids = {v: i for i, v in enumerate(self.places)}
+        self.offsets = np.ascontiguousarray(offsets, dtype=np.int64)
+        self.targets = np.ascontiguousarray(targets, dtype=np.int64)
+        self.weights = np.ascontiguousarray(weights, dtype=float)
+        self.locations = (np.zeros((len(self.places), 2)) if locations is None else
+                          np.ascontiguousarray(locations, dtype=float))
+        self.offsets_view, self.targets_view, self.weights_view = (
+            memoryview(self.offsets), memoryview(self.targets), memoryview(self.weights))
+        self.locations_view = memoryview(self.locations.reshape(-1))
+
+    @classmethod
+    def from_edges(cls, n, sources, targets, weights, places=None, locations=None):
+        "A CSRMap of n places from parallel arrays of edge source ids, target ids and distances."
+        sources = np.asarray(sources, dtype=np.int64)
+        order = np.argsort(sources, kind='stable')
+        offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=n), out=offsets[1:])
+        return cls(range(n) if places is None else places, offsets,
+                   np.asarray(targets, dtype=np.int64)[order], np.asarray(weights, dtype=float)[order],
+                   locations)
+
+    @classmethod
+    def from_map(cls, map):
+        "Convert a Map (with its `distances` dict) to a CSRMap."
+        places = list(dict.fromkeys(v for link in map.distances for v in link)) # numbered in link order, the same in every run
+        ids = {v: i for i, v in enumerate(places)}
+        sources = np.fromiter((ids[v1] for (v1, v2) in map.distances), np.int64, len(map.distances))
+        targets = np.fromiter((ids[v2] for (v1, v2) in map.distances), np.int64, len(map.distances))
+        weights = np.fromiter(map.distances.values(), float, len(map.distances))
+        locations = [map.locations[v] for v in places]
+        return cls.from_edges(len(places), sources, targets, weights, places, locations)
+
+    def to_map(self):
+        "Convert back to a Map with `distances` and `neighbors` dicts."
+        sources = np.repeat(np.arange(len(self.places)), np.diff(self.offsets))
+        links = {(self.places[i], self.places[j]): d for i, j, d in
+                 zip(sources.tolist(), self.targets.tolist(), self.weights.tolist())}
+        return Map(links, {v: tuple(xy) for v, xy in zip(self.places, self.locations.tolist())},
+                   directed=True)
+
+    def shortest_paths(self, source):
+        """Dijkstra's algorithm from the place named `source`, returning
+        ({place: distance}, {place: predecessor}) like `Map.shortest_paths`."""
+        offsets, targets, weights = self.offsets_view, self.targets_view, self.weights_view
+        dist = np.full(len(self.places), math.inf)
+        pred = np.full(len(self.places), -1, dtype=np.int64)
+        dist_view = memoryview(dist)
+        s = self.ids[source]
+        dist_view[s] = 0
+        frontier = [(0, s)]
+        while frontier:
+            d, v = heapq.heappop(frontier)
+            if d > dist_view[v]:
+                continue
+            for e in range(offsets[v], offsets[v + 1]):
+                w, d1 = targets[e], d + weights[e]
+                if d1 < dist_view[w]:
+                    dist_view[w], pred[w] = d1, v
+                    heapq.heappush(frontier, (d1, w))
+        reached = np.flatnonzero(dist < math.inf).tolist()
+        return ({self.places[i]: dist_view[i] for i in reached},
+                {self.places[i]: self.places[pred[i]] for i in reached if i != s})
+
+
+class CSRRouteProblem(Problem):
+    """A RouteProblem on a CSRMap. States are place ids (use `map.ids[name]` to get
+    one, and `map.places[i]` to name it) and actions are edge indexes, so moving
+    and costing a move are array lookups rather than tuple-keyed dict lookups."""
+
+    def actions(self, state):
+        """The edges out of `state`."""
+        return range(self.map.offsets_view[state], self.map.offsets_view[state + 1])
+
+    def result(self, state, action):
+        """The place at the end of edge `action`."""
+        return self.map.targets_view[action]
+
+    def action_cost(self, s, action, s1):
+        """The distance along edge `action`."""
+        return self.map.weights_view[action]
+
+    def h(self, node):
+        "Straight-line distance between state and the goal."
+        locs = self.map.locations_view
+        i, j = 2 * node.state, 2 * self.goal
+        return math.hypot(locs[i] - locs[j], locs[i + 1] - locs[j + 1])
+    
+    
+# Map loading - stream large edge-list and coordinate files straight into the
+# arrays of a CSRMap, and save/load CSRMaps as memory-mapped .npy files.
+
+edge_record = np.dtype([('source', '<i4'), ('target', '<i4'), ('distance', '<f4')])
+
+def load_map(edges, coordinates=None, directed=False):
+    """Load a CSRMap from an edge-list file and an optional coordinate file.
+    A .csv edge file has `source,target,distance` rows and a .csv coordinate file
+    has `place,x,y` rows (a header row and lines starting with # are skipped);
+    place names are kept as strings and numbered in order of appearance. Any other
+    edge file is read through a memory map as packed `edge_record`s, with places
+    already numbered 0..n-1 and coordinates, if any, in a .npy array of (x, y) rows.
+    Rows are streamed into flat arrays, never into per-link dicts. If
+    `directed=False`, every link is added in both directions, as in Map."""
+    if edges.endswith('.csv'):
+        places, ids = [], {}
+        def number(name):
+            if name not in ids:
+                ids[name] = len(places)
+                places.append(name)
+            return ids[name]
+        sources, targets, weights = array('q'), array('q'), array('d')
+        for row in csv_rows(edges):
+            sources.append(number(row[0]))
+            targets.append(number(row[1]))
+            weights.append(float(row[2]))
+        locations = None
+        if coordinates is not None:
+            rows = [(number(row[0]), float(row[1]), float(row[2])) for row in csv_rows(coordinates)]
+            locations = np.zeros((len(places), 2))
+            for i, x, y in rows:
+                locations[i] = x, y
+        sources, targets, weights = np.frombuffer(sources, np.int64), np.frombuffer(targets, np.int64), np.frombuffer(weights)
+    else:
+        records = np.memmap(edges, dtype=edge_record, mode='r')
+        sources, targets, weights = records['source'], records['target'], records['distance']
+        locations = None if coordinates is None else np.load(coordinates, mmap_mode='r')
+        n = max(int(sources.max(initial=-1)), int(targets.max(initial=-1)), -1 if locations is None else len(locations) - 1) + 1
+        places = range(n)
+    if not directed:
+        sources, targets = np.concatenate([sources, targets]), np.concatenate([targets, sources])
+        weights = np.concatenate([weights, weights])
+    return CSRMap.from_edges(len(places), sources, targets, weights, places, locations)
+
+def csv_rows(filename):
+    "Yield the rows of a CSV file, skipping blank lines, # comments and a header row."
+    with open(filename, newline='') as file:
+        for i, row in enumerate(csv.reader(file)):
+            if not row or row[0].startswith('#'):
+                continue
+            try:
+                float(row[-1])
+            except ValueError:
+                if i == 0:
+                    continue
+                raise
+            yield row
+
+def save_map(map, prefix):
+    """Save a CSRMap as prefix.offsets.npy, prefix.targets.npy, prefix.weights.npy
+    and prefix.locations.npy, plus prefix.places.txt (one name per line) if its
+    places are named rather than numbered."""
+    for name in ('offsets', 'targets', 'weights', 'locations'):
+        np.save('{}.{}.npy'.format(prefix, name), getattr(map, name))
+    if not isinstance(map.places, range):
+        with open(prefix + '.places.txt', 'w') as file:
+            file.writelines('{}\n'.format(v) for v in map.places)
+
+def load_saved_map(prefix):
+    """Load a CSRMap written by save_map. The arrays are memory-mapped rather than
+    read, so even very large maps are ready almost at once."""
+    arrays = [np.load('{}.{}.npy'.format(prefix, name), mmap_mode='r')
+              for name in ('offsets', 'targets', 'weights', 'locations')]
+    places = range(len(arrays[0]) - 1)
+    if os.path.exists(prefix + '.places.txt'):
+        with open(prefix + '.places.txt') as file:
+            places = file.read().splitlines()
+    return CSRMap(places, *arrays)
+    
     
 class GridProblem(Problem):
     """Finding a path on a 2D grid with obstacles. Obstacles are (x, y) cells."""
@@ -223,6 +992,201 @@ def straight_line_distance(A, B):
 
 def transpose(matrix): return list(zip(*matrix))
 
+# Jump Point Search - A* on GridProblem's uniform 8-connected grid that only
+# puts "jump points" (cells where an optimal path may turn) on the frontier and
+# skips over the cells in between.
+
+def sign(x): return (x > 0) - (x < 0)
+
+def jump_point_search(problem, h=None):
+    """Optimal search on a GridProblem (diagonal moves may cut corners, as in
+    `GridProblem.actions`), expanding only jump points. The grid is unbounded, so
+    cells outside the box around the obstacles, initial and goal cells (plus a
+    margin of one) are treated as blocked; no shortest path needs to leave it.
+    Returns (node, reached, frontiers) like best_first_search; `reached` holds the
+    jump points, but the solution node chain passes through every cell on the path."""
+    h = h or problem.h
+    cells = set(problem.obstacles) | {problem.initial, problem.goal}
+    xmin, xmax = min(x for x, y in cells) - 1, max(x for x, y in cells) + 1
+    ymin, ymax = min(y for x, y in cells) - 1, max(y for x, y in cells) + 1
+
+    def blocked(x, y):
+        return (x, y) in problem.obstacles or not (xmin <= x <= xmax and ymin <= y <= ymax)
+
+    def jump(x, y, dx, dy):
+        "The first jump point from (x, y) in direction (dx, dy), or None."
+        while True:
+            x, y = x + dx, y + dy
+            if blocked(x, y):
+                return None
+            if (x, y) == problem.goal:
+                return (x, y)
+            if dx and dy:
+                if ((blocked(x - dx, y) and not blocked(x - dx, y + dy)) or
+                    (blocked(x, y - dy) and not blocked(x + dx, y - dy)) or
+                    jump(x, y, dx, 0) or jump(x, y, 0, dy)):
+                    return (x, y)
+            elif dx:
+                if ((blocked(x, y + 1) and not blocked(x + dx, y + 1)) or
+                    (blocked(x, y - 1) and not blocked(x + dx, y - 1))):
+                    return (x, y)
+            else:
+                if ((blocked(x + 1, y) and not blocked(x + 1, y + dy)) or
+                    (blocked(x - 1, y) and not blocked(x - 1, y + dy))):
+                    return (x, y)
+
+    def directions(node):
+        "The natural and forced directions to search from `node`, pruned by how it was reached."
+        x, y = node.state
+        if node.parent is None:
+            return problem.directions
+        dx, dy = sign(x - node.parent.state[0]), sign(y - node.parent.state[1])
+        if dx and dy:
+            dirs = [(dx, 0), (0, dy), (dx, dy)]
+            if blocked(x - dx, y): dirs.append((-dx, dy))
+            if blocked(x, y - dy): dirs.append((dx, -dy))
+        elif dx:
+            dirs = [(dx, 0)]
+            if blocked(x, y + 1): dirs.append((dx, 1))
+            if blocked(x, y - 1): dirs.append((dx, -1))
+        else:
+            dirs = [(0, dy)]
+            if blocked(x + 1, y): dirs.append((1, dy))
+            if blocked(x - 1, y): dirs.append((-1, dy))
+        return dirs
+
+    def walk(node, s1):
+        "The cost of moving from `node` in a straight line to jump point s1, one cell at a time."
+        (x, y), cost = node.state, node.path_cost
+        dx, dy = sign(s1[0] - x), sign(s1[1] - y)
+        while (x, y) != s1:
+            cost += problem.action_cost((x, y), (x + dx, y + dy), (x + dx, y + dy))
+            x, y = x + dx, y + dy
+        return cost
+
+    node = Node(problem.initial)
+    frontier = PriorityQueue([node], key=lambda n: g(n) + h(n))
+    reached = {problem.initial: node}
+    while frontier:
+        node = frontier.pop()
+        if problem.is_goal(node.state):
+            return (fill_jumps(problem, node), reached, [])
+        for (dx, dy) in directions(node):
+            s1 = jump(node.state[0], node.state[1], dx, dy)
+            if s1 is not None:
+                cost = walk(node, s1)
+                if s1 not in reached or cost < reached[s1].path_cost:
+                    reached[s1] = Node(s1, node, s1, cost)
+                    frontier.add(reached[s1])
+
+    return (failure, reached, [])
+
+def fill_jumps(problem, node):
+    "Rebuild a chain of jump point nodes as a chain with one node per grid cell."
+    jumps = list(path_nodes_reversed(node))
+    jumps.reverse()
+    node = jumps[0]
+    for jp in jumps[1:]:
+        dx, dy = sign(jp.state[0] - node.state[0]), sign(jp.state[1] - node.state[1])
+        while node.state != jp.state:
+            s, s1 = node.state, (node.state[0] + dx, node.state[1] + dy)
+            node = Node(s1, node, s1, node.path_cost + problem.action_cost(s, s1, s1))
+    return node
+
+
+# Occupancy grids - GridProblem obstacles held in a NumPy boolean array, for
+# large bounded maps that are loaded in bulk rather than listed cell by cell.
+
+class OccupancyGrid:
+    """The obstacles of a bounded W x H grid as a NumPy boolean array indexed
+    grid[x, y], True for an obstacle; cells outside the array are obstacles too.
+    Like the `obstacles` set of a GridProblem it supports `cell in occupancy` and
+    iteration over obstacle cells. The array is stored with a one-cell blocked
+    border, so a neighbour of an in-bounds cell is tested with one lookup at a
+    fixed offset from the cell's flat index (see `index` and `stride`)."""
+
+    def __init__(self, grid):
+        grid = np.asarray(grid, dtype=bool)
+        self.width, self.height = grid.shape
+        self.padded = np.ones((self.width + 2, self.height + 2), dtype=bool)
+        self.padded[1:-1, 1:-1] = grid
+        self.grid = self.padded[1:-1, 1:-1]
+        self.stride = self.height + 2
+        self.blocked = memoryview(self.padded.reshape(-1)) # flat view of `padded`
+
+    @classmethod
+    def from_cells(cls, cells, shape):
+        "An OccupancyGrid of the given (W, H) shape with obstacles at `cells`."
+        grid = np.zeros(shape, dtype=bool)
+        cells = np.array(list(cells), dtype=int).reshape(-1, 2)
+        grid[cells[:, 0], cells[:, 1]] = True
+        return cls(grid)
+
+    def index(self, cell):
+        "The flat index of an in-bounds cell in `blocked`."
+        return (cell[0] + 1) * self.stride + cell[1] + 1
+
+    def clear(self, cell):
+        "Make an in-bounds cell free."
+        self.padded[cell[0] + 1, cell[1] + 1] = False
+
+    def add(self, cell):
+        "Make a cell an obstacle, like set.add (cells out of bounds already are)."
+        if 0 <= cell[0] < self.width and 0 <= cell[1] < self.height:
+            self.padded[cell[0] + 1, cell[1] + 1] = True
+
+    def discard(self, cell):
+        "Make a cell free, like set.discard (cells out of bounds stay obstacles)."
+        if 0 <= cell[0] < self.width and 0 <= cell[1] < self.height:
+            self.clear(cell)
+
+    def __contains__(self, cell):
+        x, y = cell
+        return not (0 <= x < self.width and 0 <= y < self.height) or self.blocked[self.index(cell)]
+
+    def __iter__(self):
+        return (tuple(cell) for cell in np.argwhere(self.grid).tolist())
+
+    def __len__(self): return int(self.grid.sum())
+
+
+def load_occupancy_grid(filename, threshold=0.5):
+    """Load an OccupancyGrid from a .npy file of booleans or from an image, in which
+    pixels darker than `threshold` (on a 0 to 1 scale) are obstacles and pixel
+    (row, column) is cell (column, row)."""
+    if filename.endswith('.npy'):
+        return OccupancyGrid(np.load(filename))
+    import matplotlib.image
+    image = np.asarray(matplotlib.image.imread(filename), dtype=float)
+    if image.max() > 1:
+        image = image / 255
+    if image.ndim == 3:
+        image = image[..., :3].mean(axis=2)
+    return OccupancyGrid((image < threshold).T)
+
+
+class OccupancyGridProblem(GridProblem):
+    """A GridProblem on a bounded grid whose obstacles are an OccupancyGrid (or a
+    boolean array, indexed grid[x, y], to build one from). Actions are generated
+    from precomputed flat-index offsets of the eight `directions`."""
+
+    def __init__(self, initial=(0, 0), goal=(9, 9), grid=((),), **kwds):
+        # A new OccupancyGrid (which copies the array), so clearing the initial and
+        # goal cells leaves the caller's grid as it was
+        obstacles = OccupancyGrid(grid.grid if isinstance(grid, OccupancyGrid) else grid)
+        for cell in (initial, goal):
+            if 0 <= cell[0] < obstacles.width and 0 <= cell[1] < obstacles.height:
+                obstacles.clear(cell)
+        Problem.__init__(self, initial=initial, goal=goal, obstacles=obstacles, **kwds)
+        self.offsets = [(dx * obstacles.stride + dy, dx, dy) for (dx, dy) in self.directions]
+
+    def actions(self, state):
+        """You can move one cell in any of `directions` to a non-obstacle cell."""
+        x, y = state
+        i, blocked = self.obstacles.index(state), self.obstacles.blocked
+        return [(x + dx, y + dy) for (offset, dx, dy) in self.offsets if not blocked[i + offset]]
+
+
 land_grid1 = [[1,1,2,3,3],[1,2,1,3,1],[1,1,3,1,1],[2,2,2,3,3],[3,1,1,1,1]]
 land_grid2 = [[1,1,1,1,1],[1,1,1,1,1],[1,1,1,1,1],[1,1,1,1,1],[1,1,1,1,1]]
 
@@ -245,24 +1209,83 @@ land_grid3 = create_uniform_land_grid(10)
 land_grid4 = create_random_land_grid(10)
 
 
+# Heuristic tables - per-goal arrays of heuristic values for the wrap-around
+# grids of Questions 4 to 6, computed once with NumPy and shared by every
+# problem with the same goal and grid.
+
+heuristic_tables = {} # (kind, goal, shape, grid digest) -> [table, its list form or None], least recently used first
+
+def heuristic_table(kind, goal, cost, maxsize=64, as_list=False):
+    """A table of h values, indexed [x, y], for reaching `goal` on a wrap-around
+    grid whose cells cost `cost[x, y]` to enter:
+        'torus'     - toroidal Manhattan distance, counting the last step into the
+                      goal at the goal's cost and every other step at the cheapest cost
+        'terrain'   - the exact cheapest cost to the goal, found by relaxing all cells
+                      against their four wrapped neighbours until nothing changes
+    Tables are cached by kind, goal and a SHA-256 digest of the grid, keeping the
+    `maxsize` most recently used. With as_list=True the table is returned as a
+    list of lists (faster to index one cell at a time), made once per cached table.
+    The returned table is shared, so it must not be changed."""
+    cost = np.asarray(cost, dtype=float)
+    key = (kind, goal, cost.shape, hashlib.sha256(cost.tobytes()).hexdigest())
+    if key in heuristic_tables:
+        heuristic_tables[key] = entry = heuristic_tables.pop(key)
+    else:
+        entry = heuristic_tables[key] = [compute_heuristic_table(kind, goal, cost), None]
+        while len(heuristic_tables) > maxsize:
+            del heuristic_tables[next(iter(heuristic_tables))]
+    if not as_list:
+        return entry[0]
+    if entry[1] is None:
+        entry[1] = entry[0].tolist()
+    return entry[1]
+
+def compute_heuristic_table(kind, goal, cost):
+    "The table of heuristic_table, for a float array of cell costs."
+    w, h = cost.shape
+    dx = np.abs(np.arange(w) - goal[0])[:, None]
+    dy = np.abs(np.arange(h) - goal[1])[None, :]
+    if kind == 'torus':
+        steps = np.minimum(dx, w - dx) + np.minimum(dy, h - dy)
+        table = np.where(steps > 0, (steps - 1) * cost.min() + cost[goal[0] % w, goal[1] % h], 0.0)
+    elif kind == 'terrain':
+        table = np.full(cost.shape, np.inf)
+        table[goal[0] % w, goal[1] % h] = 0
+        while True:
+            via = cost + table
+            relaxed = np.minimum.reduce([table, np.roll(via, 1, 0), np.roll(via, -1, 0),
+                                         np.roll(via, 1, 1), np.roll(via, -1, 1)])
+            if np.array_equal(relaxed, table):
+                break
+            table = relaxed
+    else:
+        raise ValueError('unknown heuristic table {!r}'.format(kind))
+    return table
+
+
 # TODO: complete the code as described in the notebook 
 
 # ANSWER TO QUESTION 4 GOES HERE 
 class GridProblemMod(Problem):
     """Finding a path on a 2D grid with obstacles. Obstacles are (x, y) cells."""
 
-    def __init__(self, initial=(15, 40), goal=(130, 30),size=10, obstacles=(), **kwds):
+    def __init__(self, initial=(15, 40), goal=(130, 30),size=10, obstacles=(), heuristic='straight', **kwds):
         #added an attribute to for the grid size
         self.size = size
         Problem.__init__(self, initial=initial, goal=goal, 
-                         obstacles=set(obstacles) - {initial, goal}, **kwds)
+                         obstacles=set(obstacles) - {initial, goal}, heuristic=heuristic, **kwds)
 
     #Modified directions to be only Up, right, down, left 
     directions = [(0,1),(1,0),(0,-1),(-1,0)] 
     
     def action_cost(self, s, action, s1): return straight_line_distance(s, s1)
     
-    def h(self, node): return straight_line_distance(node.state, self.goal)
+    #heuristic='manhattan' is Manhattan distance without wrapping (a lower bound, since a
+    #wrap-around move costs as much as walking across the grid)
+    def h(self, node): 
+        if self.heuristic == "manhattan":
+            return manhattan_distance(node.state, self.goal)
+        return straight_line_distance(node.state, self.goal)
                   
     def result(self, state, action): 
         "Both states and actions are represented by (x, y) pairs."
@@ -318,7 +1341,7 @@ class LandgridProblem(Problem):
     #updated the init method to add herusitic option
     def __init__(self, initial=(2, 2), goal=(4, 4), land_grid=[], heuristic='straight', **kwds):
         size = len(land_grid)
-        Problem.__init__(self, initial=initial, goal=goal,land_grid = land_grid, size = size, heuristic=heuristic, obstacles=set(), **kwds)
+        Problem.__init__(self, initial=initial, goal=goal,land_grid = land_grid, size = size, heuristic=heuristic, obstacles=set(), table=None, **kwds)
 
     #Directions are only Up, right, down, left 
     directions = [(0,1),(1,0),(0,-1),(-1,0)] 
@@ -337,9 +1360,15 @@ class LandgridProblem(Problem):
         return terrain_cost
     
     #checks if manhattan distance is passed as heuristic and uses it if it is
+    #'torus' and 'terrain' look the value up in a table shared by problems with the same goal and grid
     def h(self, node): 
         if self.heuristic == "manhattan":
             return manhattan_distance(node.state, self.goal)
+        elif self.heuristic in ("torus", "terrain"):
+            if self.table is None:
+                self.table = heuristic_table(self.heuristic, self.goal, self.land_grid, as_list=True)
+            x, y = node.state
+            return self.table[x % self.size][y % self.size]
         else:
             return straight_line_distance(node.state, self.goal)
                   
@@ -366,6 +1395,396 @@ def manhattan_distance(A,B):
     return abs(B[1] - A[1]) + abs(B[0] - A[0])
 
 
+# Batch solving - many independent GridProblemMod / LandgridProblem instances
+# spread over a pool of processes. The grids, start/goal cells and obstacles of
+# the whole batch are packed into shared memory once; each task only names a
+# chunk of problem numbers, and workers rebuild the problems from the arrays.
+
+batch_algorithms = {"BFS": breadth_first_bfs, "UCS": uniform_cost_search,
+                    "AST": astar_search, "GRS": greedy_bfs}
+
+batch_heuristics = ('straight', 'manhattan', 'torus', 'terrain')
+
+# Columns of the problem table: kind (0 = GridProblemMod, 1 = LandgridProblem),
+# initial x, y, goal x, y, size, heuristic number, land grid number (-1 for none),
+# and the range of the problem's rows in the obstacle table.
+batch_columns = 10
+
+def pack_batch(problems):
+    """Pack `problems` into shared memory blocks; return (blocks, layout), where
+    layout holds the block names and array shapes that `attach_batch` needs."""
+    grids, grid_numbers, obstacles = [], {}, []
+    table = np.empty((len(problems), batch_columns), dtype=np.int64)
+    for i, p in enumerate(problems):
+        grid = -1
+        if isinstance(p, LandgridProblem):
+            if id(p.land_grid) not in grid_numbers:
+                grid_numbers[id(p.land_grid)] = len(grids)
+                grids.append(np.asarray(p.land_grid, dtype=np.int64))
+            grid = grid_numbers[id(p.land_grid)]
+        start = len(obstacles)
+        obstacles.extend(sorted(p.obstacles))
+        table[i] = (isinstance(p, LandgridProblem), *p.initial, *p.goal, p.size,
+                    batch_heuristics.index(p.heuristic), grid, start, len(obstacles))
+    arrays = [table, np.array(obstacles, dtype=np.int64).reshape(-1, 2)] + grids
+    blocks, layout = [], []
+    for a in arrays:
+        block = shared_memory.SharedMemory(create=True, size=max(a.nbytes, 1))
+        np.ndarray(a.shape, a.dtype, buffer=block.buf)[...] = a
+        blocks.append(block)
+        layout.append((block.name, a.shape))
+    return blocks, layout
+
+batch = {} # the attached batch of a worker process
+
+def attach_batch(layout):
+    "Pool initializer: map the shared arrays of a packed batch into this process."
+    blocks = [shared_memory.SharedMemory(name=name) for name, shape in layout]
+    arrays = [np.ndarray(shape, np.int64, buffer=block.buf) for block, (name, shape) in zip(blocks, layout)]
+    batch.update(blocks=blocks, table=arrays[0], obstacles=arrays[1], grids=arrays[2:], land_grids={})
+
+def batch_problem(i):
+    "Rebuild problem number i of the attached batch."
+    kind, x, y, gx, gy, size, heuristic, grid, start, stop = batch['table'][i].tolist()
+    obstacles = map(tuple, batch['obstacles'][start:stop].tolist())
+    heuristic = batch_heuristics[heuristic]
+    if not kind:
+        return GridProblemMod(initial=(x, y), goal=(gx, gy), size=size, obstacles=obstacles, heuristic=heuristic)
+    if grid not in batch['land_grids']:
+        batch['land_grids'][grid] = batch['grids'][grid].tolist()
+    problem = LandgridProblem(initial=(x, y), goal=(gx, gy), land_grid=batch['land_grids'][grid], heuristic=heuristic)
+    problem.obstacles = set(obstacles)
+    return problem
+
+def solve_chunk(algorithm, start, stop):
+    "Solve problems start to stop-1 of the attached batch; one (path states, cost, stats) each."
+    results = []
+    for i in range(start, stop):
+        problem = batch_problem(i)
+        t = time.perf_counter()
+        node, reached, _ = batch_algorithms[algorithm](problem)
+        seconds = time.perf_counter() - t
+        results.append((path_states(node), node.path_cost,
+                        {'seconds': seconds, 'reached': len(reached), 'length': len(node)}))
+    return results
+
+def solve_batch(problems, algorithm="UCS", processes=None, chunksize=None):
+    """Solve each of a list of GridProblemMod and LandgridProblem instances with the
+    search named by `algorithm` (a key of `batch_algorithms`), in a pool of
+    `processes` worker processes taking `chunksize` problems at a time.
+    Returns a list with one (path states, path cost, stats) per problem, where
+    stats gives the search's 'seconds', the number of states 'reached', and the
+    path 'length' in actions. Only the initial, goal, size, heuristic, obstacles
+    and land grid of each problem are shipped to the workers."""
+    processes = processes or os.cpu_count()
+    if chunksize is None:
+        chunksize = max(1, math.ceil(len(problems) / (4 * processes)))
+    chunks = [(algorithm, i, min(i + chunksize, len(problems)))
+              for i in range(0, len(problems), chunksize)]
+    blocks, layout = pack_batch(problems)
+    try:
+        with multiprocessing.Pool(processes, initializer=attach_batch, initargs=(layout,)) as pool:
+            results = pool.starmap(solve_chunk, chunks)
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+    return [result for chunk in results for result in chunk]
+
+
+# Incremental replanning - Lifelong Planning A* (LPA*) on the grid problems.
+# After some cells change, only the part of the search whose costs changed
+# is searched again instead of running astar_search from scratch.
+
+class IncrementalPlanner:
+    """LPA* for a GridProblem, GridProblemMod or LandgridProblem with a fixed initial
+    cell and goal. `search()` finds a cheapest path like astar_search; after
+    `update_cells` blocks or unblocks cells or changes land_grid terrain costs, the next
+    `search()` repairs the previous search rather than starting over.
+    For every cell s the planner keeps g[s], the cost found so far, and rhs[s],
+    the cheapest g[p] + cost over predecessors p; only cells where the two disagree
+    are queued. The planner works on its own copy of the problem (`self.problem`),
+    and problem.h must be consistent for the paths to be optimal; with an
+    inconsistent h, search() may also give failure when the path cannot be traced
+    back through the g values it leaves. The 'torus' and
+    'terrain' tables are recomputed after each update, and 'terrain' costs a full
+    pass over the grid."""
+
+    def __init__(self, problem):
+        self.problem = problem = copy.copy(problem)
+        obstacles = problem.obstacles # copied as the same type, so an OccupancyGrid still blocks cells out of bounds
+        problem.obstacles = OccupancyGrid(obstacles.grid) if isinstance(obstacles, OccupancyGrid) else set(obstacles)
+        if hasattr(problem, 'land_grid'):
+            problem.land_grid = [list(column) for column in problem.land_grid]
+            problem.table = None
+        size = getattr(problem, 'size', None)
+        self.wrap = (lambda x, y: (x % size, y % size)) if size else (lambda x, y: (x, y))
+        self.g, self.rhs = {}, {problem.initial: 0}
+        self.queue, self.queued, self.count = [], {}, 0 # heap of (key, count, cell); cell -> key
+        self.expanded = 0
+        self.hs = {} # cell -> h, until the heuristic changes
+        self.enqueue(problem.initial)
+
+    def h(self, s):
+        if s not in self.hs:
+            self.hs[s] = self.problem.h(Node(s))
+        return self.hs[s]
+
+    def key(self, s):
+        best = min(self.g.get(s, math.inf), self.rhs.get(s, math.inf))
+        return (best + self.h(s), best)
+
+    def enqueue(self, s):
+        self.queued[s] = key = self.key(s)
+        heapq.heappush(self.queue, (key, self.count, s))
+        self.count += 1
+
+    def top(self):
+        "The (key, cell) queued with the smallest key, skipping outdated heap entries."
+        while self.queue:
+            key, _, s = self.queue[0]
+            if self.queued.get(s) == key:
+                return key, s
+            heapq.heappop(self.queue)
+        return (math.inf, math.inf), None
+
+    def successors(self, u):
+        "(v, cost) for each move out of cell u."
+        p = self.problem
+        x, y = u
+        for dx, dy in p.directions:
+            a = (x + dx, y + dy)
+            if a not in p.obstacles:
+                v = self.wrap(*a)
+                yield v, p.action_cost(u, a, v)
+
+    def predecessors(self, v):
+        "(u, cost) for each move into cell v."
+        p = self.problem
+        for dx, dy in p.directions:
+            u = self.wrap(v[0] - dx, v[1] - dy)
+            a = (u[0] + dx, u[1] + dy)
+            if a not in p.obstacles:
+                yield u, p.action_cost(u, a, v)
+
+    def update_vertex(self, s):
+        if s != self.problem.initial:
+            self.rhs[s] = min((self.g.get(u, math.inf) + c for u, c in self.predecessors(s)), default=math.inf)
+        self.queued.pop(s, None)
+        if self.g.get(s, math.inf) != self.rhs.get(s, math.inf):
+            self.enqueue(s)
+
+    def search(self):
+        """Bring the goal's cost up to date, repairing the previous search. Returns
+        (node, g, frontiers) like best_first_search, with the table of g values as `reached`."""
+        goal = self.problem.goal
+        while True:
+            key, u = self.top()
+            if u is None or (key >= self.key(goal) and self.rhs.get(goal, math.inf) == self.g.get(goal, math.inf)):
+                break
+            heapq.heappop(self.queue)
+            del self.queued[u]
+            self.expanded += 1
+            if self.g.get(u, math.inf) > self.rhs[u]:
+                self.g[u] = self.rhs[u]
+                for v, _ in self.successors(u):
+                    self.update_vertex(v)
+            else:
+                self.g[u] = math.inf
+                self.update_vertex(u)
+                for v, _ in self.successors(u):
+                    self.update_vertex(v)
+        return (self.path(), self.g, [])
+
+    def path(self):
+        """The solution node, following the cheapest predecessors back from the goal;
+        failure if that walk reaches a cell twice or a cell with no reached
+        predecessor, which outdated g values left by an inconsistent h can cause."""
+        p, g = self.problem, self.g
+        s = p.goal
+        if g.get(s, math.inf) == math.inf:
+            return failure
+        states, seen = [s], {s}
+        while s != p.initial:
+            s = min(self.predecessors(s), key=lambda uc: g.get(uc[0], math.inf) + uc[1], default=(None, 0))[0]
+            if s in seen or g.get(s, math.inf) == math.inf:
+                return failure
+            states.append(s)
+            seen.add(s)
+        node = Node(states.pop())
+        while states:
+            s1 = states.pop()
+            x, y = node.state
+            a = next((x + dx, y + dy) for dx, dy in p.directions if self.wrap(x + dx, y + dy) == s1)
+            node = Node(s1, node, a, node.path_cost + p.action_cost(node.state, a, s1))
+        return node
+
+    def update_cells(self, blocked=(), unblocked=(), costs=None):
+        """Block or unblock cells, and set the land_grid terrain costs given by a
+        {(x, y): cost} dict; then update the cells whose incoming moves changed."""
+        p = self.problem
+        changed = set(blocked) | set(unblocked)
+        for cell in blocked:
+            p.obstacles.add(cell)
+        for cell in unblocked:
+            p.obstacles.discard(cell)
+        for (x, y), cost in (costs or {}).items():
+            p.land_grid[x][y] = cost
+            changed.add((x, y))
+        if getattr(p, 'heuristic', None) in ('torus', 'terrain'):
+            p.table = None
+            self.hs.clear()
+            for s in list(self.queued):
+                self.enqueue(s)
+        for s in changed:
+            self.update_vertex(self.wrap(*s))
+
+
+# Integer-encoded grids - LandgridProblem and GridProblemMod with each cell
+# numbered x * size + y, the wrap-around moves out of every cell precomputed
+# with NumPy, and `reached` a list indexed by cell number.
+
+class EncodedGridProblem(Problem):
+    """A LandgridProblem or GridProblemMod whose states are cell numbers
+    i = x * size + y. `neighbors[i, k]` is the cell reached by moving in
+    direction k from cell i, or -1 if that move is blocked by an obstacle, and
+    `costs[i, k]` is its action cost. Actions are direction numbers, so expanding
+    a node is a table lookup. Heuristic values are precomputed for every cell.
+    Children are generated in `directions` order rather than the order of the
+    original problem's action sets, so ties may be broken differently."""
+
+    def __init__(self, problem):
+        n = problem.size
+        x, y = np.divmod(np.arange(n * n), n)
+        neighbors = np.empty((n * n, len(problem.directions)), dtype=np.int64)
+        costs = np.empty(neighbors.shape)
+        terrain = np.asarray(problem.land_grid, dtype=float).ravel() if hasattr(problem, 'land_grid') else None
+        for k, (dx, dy) in enumerate(problem.directions):
+            x1, y1 = (x + dx) % n, (y + dy) % n
+            neighbors[:, k] = x1 * n + y1
+            if terrain is not None:
+                costs[:, k] = terrain[neighbors[:, k]]
+            else:
+                costs[:, k] = np.hypot(x1 - x, y1 - y)
+            for ox, oy in problem.obstacles: # the move (x + dx, y + dy) is checked before wrapping
+                if 0 <= ox - dx < n and 0 <= oy - dy < n:
+                    neighbors[(ox - dx) * n + oy - dy, k] = -1
+        gx, gy = problem.goal
+        dx, dy = np.abs(x - gx), np.abs(y - gy)
+        if problem.heuristic in ('torus', 'terrain'):
+            h = heuristic_table(problem.heuristic, problem.goal, problem.land_grid).ravel()
+        elif problem.heuristic == 'manhattan':
+            h = dx + dy
+        else:
+            h = np.hypot(dx, dy)
+        Problem.__init__(self, initial=self.encode(problem.initial, n), goal=self.encode(problem.goal, n),
+                         size=n, directions=problem.directions, neighbors=neighbors, costs=costs)
+        # Plain lists, which are faster than NumPy arrays to index one cell at a time
+        self.moves = [[(k, int(i1), c) for k, (i1, c) in enumerate(zip(row, cost_row)) if i1 >= 0]
+                      for row, cost_row in zip(neighbors.tolist(), costs.tolist())]
+        self.h_values = h.astype(float).tolist()
+
+    @staticmethod
+    def encode(cell, size):
+        x, y = cell
+        return (x % size) * size + y % size
+
+    def decode(self, i): return divmod(i, self.size)
+
+    def decode_path(self, node):
+        "The (x, y) cells on the path to node."
+        return [self.decode(i) for i in path_states(node)]
+
+    def actions(self, i): return [k for k, i1, c in self.moves[i]]
+
+    def result(self, i, k): return int(self.neighbors[i, k])
+
+    def action_cost(self, i, k, i1): return float(self.costs[i, k])
+
+    def h(self, node): return self.h_values[node.state]
+
+
+def encoded_best_first_search(problem, f):
+    """best_first_search for an EncodedGridProblem, expanding nodes from its move
+    table; `reached` is a list with the best node for each cell number (or None)."""
+    node = Node(problem.initial)
+    frontier = PriorityQueue([node], key=f)
+    reached = [None] * (problem.size * problem.size)
+    reached[problem.initial] = node
+    moves = problem.moves
+    while frontier:
+        node = frontier.pop()
+        if node.state == problem.goal:
+            return (node, reached, [])
+        for k, i1, c in moves[node.state]:
+            cost = node.path_cost + c
+            old = reached[i1]
+            if old is None or cost < old.path_cost:
+                reached[i1] = child = Node(i1, node, k, cost)
+                frontier.add(child)
+    return (failure, reached, [])
+
+
+# Frontier-wide breadth-first search - a whole BFS level at a time, as NumPy
+# boolean masks shifted (with wrap-around) in each direction.
+
+def grid_breadth_first_search(problem):
+    """breadth_first_bfs for a GridProblemMod or LandgridProblem, giving the same
+    solution. BFS expands levels in order and puts each cell on the frontier when
+    it is first generated. So its path is, of all the paths with the fewest moves,
+    the one that at every step takes the earliest move in the `actions` order.
+    Here the levels are grown as boolean masks until the goal is reached. The
+    cells on shortest paths are marked by stepping back down the levels, and the
+    path is then traced forwards through those cells in `actions` order.
+    Each level costs O(size**2) array work. Returns (node, depths, frontiers),
+    where depths[x, y] is the BFS depth of each cell searched (-1 for the rest).
+    Falls back to breadth_first_bfs if the initial or goal cell is outside the grid."""
+    n = problem.size
+    start, goal = problem.initial, problem.goal
+    if not all(0 <= c < n for c in start + goal):
+        return breadth_first_bfs(problem)
+    moves = [] # (direction, mask of the cells that may move that way)
+    for dx, dy in problem.directions:
+        allowed = np.ones((n, n), dtype=bool)
+        for ox, oy in problem.obstacles: # the move (x + dx, y + dy) is checked before wrapping
+            if 0 <= ox - dx < n and 0 <= oy - dy < n:
+                allowed[ox - dx, oy - dy] = False
+        moves.append(((dx, dy), allowed))
+    depths = np.full((n, n), -1, dtype=np.int64)
+    depths[start] = 0
+    frontier = np.zeros((n, n), dtype=bool)
+    frontier[start] = True
+    depth = 0
+    while depths[goal] < 0:
+        reached = np.zeros((n, n), dtype=bool)
+        for d, allowed in moves:
+            reached |= np.roll(frontier & allowed, d, axis=(0, 1))
+        frontier = reached & (depths < 0)
+        if not frontier.any():
+            return (failure, depths, [])
+        depth += 1
+        depths[frontier] = depth
+    # Mark the cells on some shortest path, from the goal back to the start
+    on_path = np.zeros((n, n), dtype=bool)
+    on_path[goal] = True
+    level = on_path.copy()
+    for i in range(depth - 1, -1, -1):
+        before = np.zeros((n, n), dtype=bool)
+        for d, allowed in moves:
+            before |= np.roll(level, (-d[0], -d[1]), axis=(0, 1)) & allowed
+        level = before & (depths == i)
+        on_path |= level
+    node = Node(start)
+    for i in range(depth):
+        s = node.state
+        for action in problem.actions(s):
+            s1 = problem.result(s, action)
+            if on_path[s1] and depths[s1] == i + 1:
+                break
+        node = Node(s1, node, action, node.path_cost + problem.action_cost(s, action, s1))
+    return (node, depths, [])
+
+
 # This code will not work until you have implemented LandGridProblem 
 
 d1 = LandgridProblem(initial = (2,2), land_grid = land_grid1)
@@ -0,0 +1,180 @@
+"""Question 7 - experimental comparison of the search algorithms.
+
+Generates reproducible workloads at several sizes and runs every search
+algorithm on them, writing one record per run with the wall time, the number
+of nodes expanded and the peak memory, as JSON lines or CSV:
+
+    python a1_q7_benchmark.py --sizes 10 64 256 --map-sizes 100 1000 --output results.jsonl
+
+Workloads:
+    landgrid  - LandgridProblem on an n x n grid of random terrain costs 1 to 3
+                (as made by create_random_land_grid), from a corner to the middle
+    obstacles - GridProblem with a random field of obstacles over an n x n box,
+                from (0, 0) to (n - 1, n - 1)
+    map       - RouteProblem on a random planar Map of n places, each linked to
+                its nearest neighbours, from a random place to the farthest one it can reach
+"""
+
+import argparse
+import contextlib
+import csv
+import io
+import json
+import math
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+# The example client code of both scripts prints as they are imported.
+with contextlib.redirect_stdout(io.StringIO()):
+    import a1_q123_search as search
+    import a1_q456 as grids
+
+
+# Workloads - each returns the problem for a size and seed.
+
+def landgrid_workload(n, seed, heuristic='torus'):
+    "A LandgridProblem over random terrain, like create_random_land_grid(n)."
+    rng = np.random.default_rng(seed)
+    land_grid = rng.integers(1, 4, (n, n)).tolist()
+    return grids.LandgridProblem(initial=(0, 0), goal=(n // 2, n // 2), land_grid=land_grid, heuristic=heuristic)
+
+def obstacles_workload(n, seed, density=0.2):
+    "A GridProblem across an n x n box in which each cell is an obstacle with probability `density`."
+    rng = np.random.default_rng(seed)
+    xs, ys = np.nonzero(rng.random((n, n)) < density)
+    return grids.GridProblem(initial=(0, 0), goal=(n - 1, n - 1), obstacles=zip(xs.tolist(), ys.tolist()))
+
+def map_workload(n, seed, k=4):
+    """A RouteProblem on n random places in a 1000 x 1000 square, each linked to its
+    k nearest neighbours (which keeps the Map close to planar)."""
+    rng = np.random.default_rng(seed)
+    points = rng.random((n, 2)) * 1000
+    links = {}
+    for start in range(0, n, 1000): # a block of rows of the distance matrix at a time
+        block = np.hypot(*(points[start:start + 1000, None, :] - points[None, :, :]).transpose(2, 0, 1))
+        nearest = np.argsort(block, axis=1)[:, 1:k + 1]
+        for i, row in enumerate(nearest.tolist(), start):
+            for j in row:
+                links[i, j] = float(block[i - start, j])
+    map = grids.Map(links, {i: tuple(p) for i, p in enumerate(points.tolist())})
+    initial = int(rng.integers(n))
+    distances = map.shortest_paths(initial)[0]
+    return grids.RouteProblem(initial, max(distances, key=distances.get), map=map)
+
+workloads = {'landgrid': landgrid_workload, 'obstacles': obstacles_workload, 'map': map_workload}
+
+
+# Algorithms - each runs one search and returns its solution node. Searches
+# whose cost grows too quickly are only run up to `max_states` states.
+
+def random_priority_search(problem, seed):
+    "Question 3's random search, seeded for the run and without recording frontiers."
+    return search.random_search(problem, seed=seed, trace=None)
+
+def contraction_hierarchy_search(problem, seed):
+    """Build a ContractionHierarchy of the problem's Map (included in the time) and
+    query it; its `reached` is the set of places the query settled."""
+    return grids.ContractionHierarchy(problem.map).search(problem)
+
+# code -> (search(problem, seed), workloads it applies to, max_states)
+algorithms = {
+    # BFS re-queues every state it later reaches more cheaply, which grows quickly with costly terrain
+    'BFS': (lambda p, seed: grids.breadth_first_bfs(p), ('landgrid', 'obstacles', 'map'), 128 * 128),
+    'UCS': (lambda p, seed: grids.uniform_cost_search(p), ('landgrid', 'obstacles', 'map'), math.inf),
+    'AST': (lambda p, seed: grids.astar_search(p), ('landgrid', 'obstacles', 'map'), math.inf),
+    'GRS': (lambda p, seed: grids.greedy_bfs(p), ('landgrid', 'obstacles', 'map'), math.inf),
+    'RNS': (random_priority_search, ('landgrid', 'map'), math.inf), # wanders off on the unbounded GridProblem
+    'ARN': (lambda p, seed: search.best_first_search(p, f=search.g, arena=True), ('landgrid', 'obstacles', 'map'), math.inf),
+    'BDU': (lambda p, seed: search.bidirectional_uniform_cost_search(p), ('obstacles', 'map'), math.inf),
+    'BDA': (lambda p, seed: search.bidirectional_astar_search(p), ('obstacles', 'map'), math.inf),
+    'JPS': (lambda p, seed: grids.jump_point_search(p), ('obstacles',), math.inf),
+    'CH':  (contraction_hierarchy_search, ('map',), 100000),
+    'IDA': (lambda p, seed: search.ida_star_search(p), ('landgrid', 'obstacles', 'map'), 1000),
+    'SMA': (lambda p, seed: search.sma_star_search(p), ('landgrid', 'obstacles', 'map'), 4096),
+}
+
+
+def count_expansions(problem):
+    "Make `problem` count its calls of `actions`; returns the one-element counter list."
+    calls = [0]
+    actions = problem.actions
+    def counted_actions(state):
+        calls[0] += 1
+        return actions(state)
+    problem.actions = counted_actions
+    return calls
+
+def run(workload, n, seed, code, memory=True):
+    """Run algorithm `code` on the workload of size n and seed, returning a record of
+    the time, nodes expanded (calls of `actions`; for searches that never call it,
+    such as CH, the number of states reached, or None if none are reported), peak
+    traced memory, and solution."""
+    problem = workloads[workload](n, seed)
+    searcher = algorithms[code][0]
+    calls = count_expansions(problem)
+    t = time.perf_counter()
+    node, reached, _ = searcher(problem, seed)
+    seconds = time.perf_counter() - t
+    expanded = calls[0] or len(reached) or None
+    peak = None
+    if memory: # run again under tracemalloc, which slows the search down
+        problem = workloads[workload](n, seed)
+        tracemalloc.start()
+        searcher(problem, seed)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return {'workload': workload, 'size': n, 'states': n if workload == 'map' else n * n,
+            'seed': seed, 'algorithm': code, 'seconds': seconds, 'expanded': expanded,
+            'peak_bytes': peak, 'cost': node.path_cost if node.path_cost < math.inf else None,
+            'length': len(search.path_states(node)),
+            'python': platform.python_version()}
+
+def benchmark(sizes=(10, 32, 128, 512), map_sizes=(100, 1000, 10000), seeds=(0,),
+              workload_names=tuple(workloads), codes=tuple(algorithms), memory=True):
+    "Generate the records of every applicable (workload, size, seed, algorithm) run."
+    for workload in workload_names:
+        for n in (map_sizes if workload == 'map' else sizes):
+            states = n if workload == 'map' else n * n
+            for seed in seeds:
+                for code in codes:
+                    _, applies_to, max_states = algorithms[code]
+                    if workload in applies_to and states <= max_states:
+                        yield run(workload, n, seed, code, memory)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the Assignment 1 search algorithms.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 32, 128, 512],
+                        help='grid side lengths, e.g. 10 64 256 1024 4096')
+    parser.add_argument('--map-sizes', type=int, nargs='+', default=[100, 1000, 10000],
+                        help='numbers of places in the random maps')
+    parser.add_argument('--seeds', type=int, nargs='+', default=[0])
+    parser.add_argument('--workloads', nargs='+', choices=list(workloads), default=list(workloads))
+    parser.add_argument('--algorithms', nargs='+', choices=list(algorithms), default=list(algorithms))
+    parser.add_argument('--no-memory', action='store_true', help='skip the second, traced run')
+    parser.add_argument('--format', choices=['jsonl', 'csv'], default='jsonl')
+    parser.add_argument('--output', help='file to write (default: standard output)')
+    args = parser.parse_args(argv)
+
+    out = open(args.output, 'w', newline='') if args.output else sys.stdout
+    writer = None
+    try:
+        for record in benchmark(args.sizes, args.map_sizes, args.seeds, args.workloads,
+                                args.algorithms, not args.no_memory):
+            if args.format == 'csv':
+                if writer is None:
+                    writer = csv.DictWriter(out, fieldnames=list(record))
+                    writer.writeheader()
+                writer.writerow(record)
+            else:
+                out.write(json.dumps(record) + '\n')
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+if __name__ == '__main__':
+    main()